@@ -4,7 +4,8 @@ const path = require("path");
 const fs = require("fs");
 const { v4: uuidv4 } = require("uuid");
 const admin = require("firebase-admin");
-const { exec } = require('child_process');
+const { spawn } = require('child_process');
+const readline = require('readline');
 
 // Firebase Admin SDK 초기화
 const serviceAccount = require("./firebase-service-account.json"); // 서비스 계정 키 파일 경로
@@ -40,6 +41,203 @@ if (!fs.existsSync(userPoseDataDirectory)) {
   fs.mkdirSync(userPoseDataDirectory, { recursive: true });
 }
 
+// 상주 분석 워커 (python bowling_pose_analysis.py --serve)
+// 모델과 기준 포즈를 한 번만 로드하고, 작업은 JSON-lines로 주고받습니다.
+// 워커는 작업을 순서대로 처리하므로 pendingJobs의 첫 작업이 현재 분석 중인 작업입니다.
+const ANALYSIS_IDLE_TIMEOUT_MS = 60 * 1000; // 진행 이벤트 없이 기다리는 최대 시간
+const ANALYSIS_TIMEOUT_MS = 10 * 60 * 1000; // 작업 하나의 최대 분석 시간
+// true이면 모든 포즈가 충분히 높은 유사도에 도달했을 때 남은 프레임을 분석하지 않습니다.
+// 뒤쪽 프레임의 더 좋은 자세를 놓칠 수 있으므로 기본값은 끄고, 오래 걸리는 분석은 위 시간 제한으로 취소합니다.
+const ANALYSIS_EARLY_STOP = false;
+let analysisWorker = null;
+let nextJobId = 1;
+const pendingJobs = new Map();
+let watchdogTimer = null;
+
+// 현재 작업의 시간 제한을 다시 설정합니다. 제한을 넘기면 워커를 종료하여 분석을 취소합니다.
+function watchActiveJob() {
+  clearTimeout(watchdogTimer);
+  watchdogTimer = null;
+  const active = pendingJobs.values().next().value;
+  if (!active) {
+    return;
+  }
+  if (!active.startedAt) {
+    active.startedAt = Date.now();
+  }
+  const remaining = ANALYSIS_TIMEOUT_MS - (Date.now() - active.startedAt);
+  watchdogTimer = setTimeout(() => {
+    console.error(`Analysis job ${active.id} timed out`);
+    if (analysisWorker) {
+      analysisWorker.timedOutJobId = active.id;
+      analysisWorker.kill();
+    }
+  }, Math.max(0, Math.min(ANALYSIS_IDLE_TIMEOUT_MS, remaining)));
+}
+
+function getAnalysisWorker() {
+  if (analysisWorker) {
+    return analysisWorker;
+  }
+
+  const worker = spawn("python", ["bowling_pose_analysis.py", "--serve"], {
+    cwd: __dirname,
+    stdio: ["pipe", "pipe", "pipe"],
+  });
+
+  readline.createInterface({ input: worker.stdout }).on("line", (line) => {
+    let message;
+    try {
+      message = JSON.parse(line);
+    } catch (parseError) {
+      console.error(`Worker output parsing error: ${parseError}`);
+      return;
+    }
+    const job = pendingJobs.get(message.id);
+    if (!job) {
+      return;
+    }
+    if (message.status === "progress") {
+      watchActiveJob();
+      if (job.onProgress) {
+        job.onProgress(message);
+      }
+      return;
+    }
+    pendingJobs.delete(message.id);
+    if (message.status === "ok") {
+      job.resolve(message.result);
+    } else {
+      job.reject(new Error(message.error));
+    }
+    watchActiveJob();
+  });
+
+  worker.stderr.on("data", (data) => {
+    console.error(`worker stderr: ${data}`);
+  });
+
+  worker.on("exit", (code) => {
+    console.error(`Analysis worker exited with code ${code}`);
+    releaseWorker(worker, new Error("분석 워커가 종료되었습니다."));
+  });
+
+  // 실행 파일이 없거나(ENOENT) 종료된 워커에 쓰는 경우(EPIPE) 서버가 죽지 않도록 처리합니다.
+  worker.on("error", (error) => {
+    console.error(`Analysis worker error: ${error}`);
+    releaseWorker(worker, new Error(`분석 워커를 실행할 수 없습니다: ${error.message}`));
+  });
+
+  worker.stdin.on("error", (error) => {
+    console.error(`Analysis worker stdin error: ${error}`);
+    releaseWorker(worker, new Error("분석 워커에 작업을 전달하지 못했습니다."));
+    worker.kill();
+  });
+
+  analysisWorker = worker;
+  return worker;
+}
+
+// 워커가 종료되거나 오류가 나면 한 번만 정리합니다.
+// 시간 초과로 종료한 경우 대기 중이던 작업은 새 워커에서 다시 처리하고, 그 외에는 실패로 돌려줍니다.
+function releaseWorker(worker, error) {
+  if (worker.released) {
+    return;
+  }
+  worker.released = true;
+  if (analysisWorker === worker) {
+    analysisWorker = null;
+  }
+  clearTimeout(watchdogTimer);
+  watchdogTimer = null;
+  const timedOutJobId = worker.timedOutJobId;
+  const remainingJobs = [...pendingJobs.values()];
+  pendingJobs.clear();
+  for (const job of remainingJobs) {
+    if (timedOutJobId !== undefined && job.id !== timedOutJobId) {
+      submitJob(job);
+    } else if (job.id === timedOutJobId) {
+      job.reject(new Error("분석 시간이 초과되었습니다."));
+    } else {
+      job.reject(error);
+    }
+  }
+}
+
+function submitJob(job) {
+  job.startedAt = null;
+  pendingJobs.set(job.id, job);
+  getAnalysisWorker().stdin.write(JSON.stringify(job.payload) + "\n");
+  if (pendingJobs.size === 1) {
+    watchActiveJob();
+  }
+}
+
+// onProgress는 워커의 started/progress 이벤트마다 호출됩니다.
+function analyzeVideo(videoPath, userId, onProgress) {
+  return new Promise((resolve, reject) => {
+    const id = nextJobId++;
+    submitJob({
+      id: id,
+      payload: {
+        id: id,
+        video_path: videoPath,
+        user_id: userId,
+        stream: true,
+        early_stop: ANALYSIS_EARLY_STOP,
+      },
+      onProgress: onProgress,
+      resolve: resolve,
+      reject: reject,
+    });
+  });
+}
+
+// 분석 진행 상황을 Firestore 문서에 기록합니다.
+// 진행 이벤트는 수십 프레임마다 오므로, 문서당 쓰기 한도(초당 약 1회)와 쓰기 비용을 넘지 않도록
+// PROGRESS_WRITE_INTERVAL_MS에 한 번만 쓰고 값이 바뀌지 않았으면 쓰지 않습니다.
+// flush는 대기 중인 마지막 상태를 바로 기록합니다.
+const PROGRESS_WRITE_INTERVAL_MS = 3000;
+
+function createProgressWriter(docRef) {
+  let lastWrittenAt = 0;
+  let lastWritten = null;
+  let pending = null;
+  let timer = null;
+
+  function write() {
+    clearTimeout(timer);
+    timer = null;
+    if (pending === null) {
+      return Promise.resolve();
+    }
+    const serialized = JSON.stringify(pending);
+    const analysisProgress = pending;
+    pending = null;
+    if (serialized === lastWritten) {
+      return Promise.resolve();
+    }
+    lastWritten = serialized;
+    lastWrittenAt = Date.now();
+    return docRef
+      .update({ analysisProgress: analysisProgress })
+      .catch((error) => console.error(`progress update error: ${error}`));
+  }
+
+  return {
+    update(analysisProgress) {
+      pending = analysisProgress;
+      const wait = PROGRESS_WRITE_INTERVAL_MS - (Date.now() - lastWrittenAt);
+      if (wait <= 0) {
+        write();
+      } else if (!timer) {
+        timer = setTimeout(write, wait);
+      }
+    },
+    flush: write,
+  };
+}
+
 // Admin password file path and initial password
 const adminPasswordPath = path.join(__dirname, "adminPassword.json");
 let adminPassword = "0000"; // Default password
@@ -242,169 +440,169 @@ app.post("/analyze", upload.single("video"), async (req, res) => {
   // Firestore에 업로드 정보 추가
   const videoDocRef = await db.collection("videoUploads").add(videoData);
 
-  // Python 스크립트를 사용하여 실제 분석을 수행하도록 호출
+  // 상주 분석 워커에 작업을 전달하여 실제 분석을 수행
   const normalizedVideoPath = path.normalize(videoData.videoPath);
-  exec(
-    `python bowling_pose_analysis.py "${normalizedVideoPath}" "${userId}"`,
-    async (error, stdout, stderr) => {
-      if (error) {
-        console.error(`exec error: ${error}`);
-        console.error(`stderr: ${stderr}`);
-        return res.send("분석 중 오류가 발생했습니다.");
+  let analysisResult;
+  // 진행 상황을 Firestore에 기록하여 분석 중에도 확인할 수 있게 합니다.
+  const progressWriter = createProgressWriter(videoDocRef);
+  try {
+    analysisResult = await analyzeVideo(normalizedVideoPath, userId, (progress) => {
+      if (progress.event !== "progress") {
+        return;
       }
+      progressWriter.update({
+        frameIndex: progress.frame_index,
+        frameCount: progress.frame_count,
+        bestSimilarity: progress.best_similarity,
+      });
+    });
+  } catch (error) {
+    console.error(`analysis error: ${error}`);
+    await progressWriter.flush();
+    return res.send("분석 중 오류가 발생했습니다.");
+  }
+  await progressWriter.flush();
 
-      try {
-        // stdout에서 JSON 부분만 추출
-        const jsonStartIndex = stdout.indexOf('{');
-        const jsonEndIndex = stdout.lastIndexOf('}');
-        if (jsonStartIndex === -1 || jsonEndIndex === -1) {
-          throw new Error('Python 스크립트 출력에서 JSON 데이터를 찾을 수 없습니다.');
-        }
-        const jsonString = stdout.substring(jsonStartIndex, jsonEndIndex + 1);
-
-        const analysisResult = JSON.parse(jsonString);
-
-        console.log("Analysis Result:", analysisResult);
-
-        // Firestore에 분석 결과 추가
-        await videoDocRef.update({ analysisResult: analysisResult });
-
-        // 분석 결과를 HTML로 렌더링
-        let resultHtml = `
-          <html>
-          <head>
-            <title>분석 결과</title>
-            <style>
-              body {
-                font-family: Arial, sans-serif;
-                margin: 0;
-                padding: 20px;
-                background-color: #f4f4f4;
-              }
-              .container {
-                max-width: 1200px;
-                padding: 20px;
-                border: 1px solid #ccc;
-                border-radius: 8px;
-                background-color: #fff;
-                box-shadow: 0 0 10px rgba(0,0,0,0.1);
-              }
-              h1 {
-                text-align: center;
-                color: #333;
-              }
-              table {
-                width: 100%;
-                border-collapse: collapse;
-                margin-bottom: 30px;
-              }
-              th, td {
-                border: 1px solid #ddd;
-                padding: 8px;
-                text-align: center;
-              }
-              th {
-                background-color: #f2f2f2;
-              }
-              img {
-                max-width: 100%;
-                height: auto;
-                border-radius: 4px;
-              }
-              .home-btn {
-                display: block;
-                text-align: center;
-                margin-top: 20px;
-                background-color: #28a745;
-                color: white;
-                padding: 10px 20px;
-                border-radius: 4px;
-                text-decoration: none;
-              }
-              .home-btn:hover {
-                background-color: #218838;
-              }
-              .corrections {
-                text-align: left;
-                padding: 10px;
-                background-color: #f9f9f9;
-                border: 1px solid #ddd;
-                border-radius: 4px;
-                margin-bottom: 20px;
-              }
-            </style>
-          </head>
-          <body>
-            <div class="container">
-              <h1>분석 결과</h1>
-
-              <!-- 사용자 영상 재생 추가 -->
-              <div style="text-align: center; margin-bottom: 20px;">
-                <video controls width="800">
-                  <source src="/video/${videoData.fileName}" type="video/mp4">
-                  Your browser does not support the video tag.
-                </video>
-              </div>
-
-              <table>
-                <tr>
-                  <th>포즈</th>
-                  <th>비슷한 프레임</th>
-                  <th>유사도</th>
-                  <th>기준 포즈</th>
-                </tr>
-        `;
+  try {
+    console.log("Analysis Result:", analysisResult);
 
-        // 6개의 포즈에 대해 비교 결과 추가
-        for (let i = 1; i <= 6; i++) {
-          const poseKey = `포즈 ${i}`;
-          const poseData = analysisResult[poseKey];
+    // Firestore에 분석 결과 추가
+    await videoDocRef.update({ analysisResult: analysisResult });
 
-          if (poseData && poseData.user_image) {
-            resultHtml += `
-              <tr>
-                <td>포즈 ${i}</td>
-                <td><img src="${poseData.user_image}" alt="사용자 포즈 ${i}" onerror="this.onerror=null; this.src='/professional_poses/default_image.jpg'"></td>
-                <td>${poseData.similarity}</td>
-                <td><img src="${poseData.professional_image}" alt="선수 포즈 ${i}"></td>
-              </tr>
-              <tr>
-                <td colspan="4">
-                  <strong>수정 필요 사항:</strong> ${poseData.feedback || '분석 결과가 없습니다.'}
-                </td>
-              </tr>
-            `;
-          } else {
-            resultHtml += `
-              <tr>
-                <td>포즈 ${i}</td>
-                <td colspan="2">포즈를 찾을 수 없습니다.</td>
-                <td><img src="/professional_poses/pose${i}-1.jpg" alt="선수 포즈 ${i}"></td>
-              </tr>
-              <tr>
-                <td colspan="4">
-                  <strong>수정 필요 사항:</strong> 포즈를 인식하지 못했습니다.
-                </td>
-              </tr>
-            `;
+    // 분석 결과를 HTML로 렌더링
+    let resultHtml = `
+      <html>
+      <head>
+        <title>분석 결과</title>
+        <style>
+          body {
+            font-family: Arial, sans-serif;
+            margin: 0;
+            padding: 20px;
+            background-color: #f4f4f4;
           }
-        }
+          .container {
+            max-width: 1200px;
+            padding: 20px;
+            border: 1px solid #ccc;
+            border-radius: 8px;
+            background-color: #fff;
+            box-shadow: 0 0 10px rgba(0,0,0,0.1);
+          }
+          h1 {
+            text-align: center;
+            color: #333;
+          }
+          table {
+            width: 100%;
+            border-collapse: collapse;
+            margin-bottom: 30px;
+          }
+          th, td {
+            border: 1px solid #ddd;
+            padding: 8px;
+            text-align: center;
+          }
+          th {
+            background-color: #f2f2f2;
+          }
+          img {
+            max-width: 100%;
+            height: auto;
+            border-radius: 4px;
+          }
+          .home-btn {
+            display: block;
+            text-align: center;
+            margin-top: 20px;
+            background-color: #28a745;
+            color: white;
+            padding: 10px 20px;
+            border-radius: 4px;
+            text-decoration: none;
+          }
+          .home-btn:hover {
+            background-color: #218838;
+          }
+          .corrections {
+            text-align: left;
+            padding: 10px;
+            background-color: #f9f9f9;
+            border: 1px solid #ddd;
+            border-radius: 4px;
+            margin-bottom: 20px;
+          }
+        </style>
+      </head>
+      <body>
+        <div class="container">
+          <h1>분석 결과</h1>
+
+          <!-- 사용자 영상 재생 추가 -->
+          <div style="text-align: center; margin-bottom: 20px;">
+            <video controls width="800">
+              <source src="/video/${videoData.fileName}" type="video/mp4">
+              Your browser does not support the video tag.
+            </video>
+          </div>
 
+          <table>
+            <tr>
+              <th>포즈</th>
+              <th>비슷한 프레임</th>
+              <th>유사도</th>
+              <th>기준 포즈</th>
+            </tr>
+    `;
+
+    // 6개의 포즈에 대해 비교 결과 추가
+    for (let i = 1; i <= 6; i++) {
+      const poseKey = `포즈 ${i}`;
+      const poseData = analysisResult[poseKey];
+
+      if (poseData && poseData.user_image) {
         resultHtml += `
-              </table>
-              <a href="/viewHistory?userId=${userId}" class="home-btn">돌아가기</a>
-            </div>
-          </body>
-          </html>
+          <tr>
+            <td>포즈 ${i}</td>
+            <td><img src="${poseData.user_thumbnail || poseData.user_image}" alt="사용자 포즈 ${i}" onerror="this.onerror=null; this.src='/professional_poses/default_image.jpg'"></td>
+            <td>${poseData.similarity}</td>
+            <td><img src="${poseData.professional_image}" alt="선수 포즈 ${i}"></td>
+          </tr>
+          <tr>
+            <td colspan="4">
+              <strong>수정 필요 사항:</strong> ${poseData.feedback || '분석 결과가 없습니다.'}
+            </td>
+          </tr>
+        `;
+      } else {
+        resultHtml += `
+          <tr>
+            <td>포즈 ${i}</td>
+            <td colspan="2">포즈를 찾을 수 없습니다.</td>
+            <td><img src="/professional_poses/pose${i}-1.jpg" alt="선수 포즈 ${i}"></td>
+          </tr>
+          <tr>
+            <td colspan="4">
+              <strong>수정 필요 사항:</strong> 포즈를 인식하지 못했습니다.
+            </td>
+          </tr>
         `;
-
-        res.send(resultHtml);
-      } catch (parseError) {
-        console.error(`Parsing error: ${parseError}`);
-        res.send("분석 결과를 처리하는 중 오류가 발생했습니다.");
       }
     }
-  );
+
+    resultHtml += `
+          </table>
+          <a href="/viewHistory?userId=${userId}" class="home-btn">돌아가기</a>
+        </div>
+      </body>
+      </html>
+    `;
+
+    res.send(resultHtml);
+  } catch (parseError) {
+    console.error(`Parsing error: ${parseError}`);
+    res.send("분석 결과를 처리하는 중 오류가 발생했습니다.");
+  }
 });
 
 // 업로드 히스토리 페이지
@@ -746,7 +944,7 @@ app.get("/results/:fileName", async (req, res) => {
           resultHtml += `
             <tr>
               <td>포즈 ${i}</td>
-              <td><img src="${poseData.user_image}" alt="사용자 포즈 ${i}" onerror="this.onerror=null; this.src='/professional_poses/default_image.jpg'"></td>
+              <td><img src="${poseData.user_thumbnail || poseData.user_image}" alt="사용자 포즈 ${i}" onerror="this.onerror=null; this.src='/professional_poses/default_image.jpg'"></td>
               <td>${poseData.similarity}</td>
               <td><img src="${poseData.professional_image}" alt="선수 포즈 ${i}"></td>
             </tr>
@@ -0,0 +1,304 @@
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+import cv2
+import numpy as np
+import bowling_pose_analysis as bpa
+
+# 벤치마크 결과 저장 폴더
+BENCHMARK_RESULT_FOLDER = os.path.join(bpa.PROJECT_ROOT, 'benchmarks')
+CLI_RESULT_FOLDER = bpa.USER_POSE_DATA_FOLDER
+# 새 인터프리터에서 bowling_pose_analysis를 import하는 데 허용하는 시간(초)과,
+# import만으로는 불러오면 안 되는 무거운 모듈
+IMPORT_TIME_BUDGET = 0.3
+HEAVY_MODULES = ('cv2', 'mediapipe', 'scipy')
+
+def summarize(samples):
+    """측정값(초) 목록을 밀리초 단위 통계로 요약합니다."""
+    if not samples:
+        return {"count": 0}
+    values = np.array(samples) * 1000
+    return {
+        "count": len(samples),
+        "mean_ms": float(values.mean()),
+        "p50_ms": float(np.percentile(values, 50)),
+        "p95_ms": float(np.percentile(values, 95)),
+        "max_ms": float(values.max())
+    }
+
+def peak_rss_mb(who=resource.RUSAGE_SELF):
+    """최대 상주 메모리(MB)를 반환합니다. (Linux 기준 ru_maxrss는 KB 단위)"""
+    return resource.getrusage(who).ru_maxrss / 1024
+
+def generate_video(path, frames, width, height, fps, seed=0):
+    """기준 포즈 이미지를 조금씩 이동/확대하며 이어 붙인 합성 영상을 만듭니다.
+
+    실제 사용자 영상 없이도 Mediapipe가 사람을 인식할 수 있도록 저장소에 포함된 기준 이미지를 사용합니다.
+    """
+    rng = np.random.default_rng(seed)
+    images = []
+    for _, _, image_path in bpa.reference_image_paths():
+        image = cv2.imread(image_path)
+        if image is not None:
+            images.append(cv2.resize(image, (width, height)))
+    if not images:
+        raise RuntimeError("기준 포즈 이미지를 찾을 수 없습니다.")
+
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), fps, (width, height))
+    frames_per_image = max(1, frames // len(images))
+    for i in range(frames):
+        image = images[(i // frames_per_image) % len(images)]
+        shift_x, shift_y = rng.integers(-8, 9, size=2)
+        scale = 1.0 + 0.02 * np.sin(i / 10)
+        matrix = np.float32([[scale, 0, shift_x], [0, scale, shift_y]])
+        writer.write(cv2.warpAffine(image, matrix, (width, height), borderMode=cv2.BORDER_REPLICATE))
+    writer.release()
+
+def synthetic_landmark_stream(standard_poses, frames, seed=0):
+    """기준 포즈 사이를 보간하고 잡음을 더한 합성 랜드마크 시퀀스(F, 10, 3)를 만듭니다."""
+    rng = np.random.default_rng(seed)
+    keyframes = [coords_list[0] for _, coords_list in sorted(standard_poses.items())]
+    positions = np.linspace(0, len(keyframes) - 1, frames)
+    stream = []
+    for position in positions:
+        low = int(np.floor(position))
+        high = min(low + 1, len(keyframes) - 1)
+        weight = position - low
+        coords = (1 - weight) * keyframes[low] + weight * keyframes[high]
+        stream.append(coords + rng.normal(scale=0.01, size=coords.shape))
+    return np.array(stream)
+
+def bench_stages(video_path, standard_poses):
+    """영상을 한 프레임씩 처리하며 단계별 지연 시간을 측정합니다."""
+    reference_set = bpa.prepare_reference_set(standard_poses)
+    estimator = bpa.create_pose_estimator()
+    stages = {name: [] for name in ("decode", "extract_landmarks", "normalize_pose", "scoring", "feedback")}
+    detected = 0
+
+    cap = cv2.VideoCapture(video_path)
+    start_all = time.perf_counter()
+    try:
+        while True:
+            start = time.perf_counter()
+            ret, frame = cap.read()
+            if not ret:
+                break
+            stages["decode"].append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            landmarks = bpa.extract_landmarks_from_image(frame, estimator)
+            stages["extract_landmarks"].append(time.perf_counter() - start)
+            if landmarks is None:
+                continue
+            detected += 1
+
+            start = time.perf_counter()
+            normalized = bpa.normalize_pose(landmarks)
+            stages["normalize_pose"].append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            final_similarity, comprehensive_similarities = bpa.score_frames(normalized, reference_set)
+            results = bpa.select_best_matches(final_similarity, comprehensive_similarities, reference_set)
+            stages["scoring"].append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            for _, _, _, _, _, best_standard_coords in results:
+                bpa.analyze_hip_flexion(normalized, best_standard_coords)
+                bpa.analyze_position_distance(normalized, best_standard_coords)
+                bpa.analyze_arm_height(normalized, best_standard_coords)
+            stages["feedback"].append(time.perf_counter() - start)
+    finally:
+        cap.release()
+        estimator.close()
+    elapsed = time.perf_counter() - start_all
+
+    frames = len(stages["decode"])
+    return {
+        "frames": frames,
+        "detected_frames": detected,
+        "frames_per_second": frames / elapsed if elapsed > 0 else 0,
+        "stages": {name: summarize(samples) for name, samples in stages.items()}
+    }
+
+def bench_synthetic_scoring(standard_poses, frames, chunk):
+    """합성 랜드마크 스트림으로 프레임별/청크별 유사도 계산 처리량을 측정합니다."""
+    reference_set = bpa.prepare_reference_set(standard_poses)
+    stream = synthetic_landmark_stream(standard_poses, frames)
+
+    start = time.perf_counter()
+    for coords in stream:
+        bpa.score_frames(coords, reference_set)
+    per_frame = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for offset in range(0, frames, chunk):
+        bpa.score_frames(stream[offset:offset + chunk], reference_set)
+    chunked = time.perf_counter() - start
+
+    return {
+        "frames": frames,
+        "chunk": chunk,
+        "per_frame_fps": frames / per_frame if per_frame > 0 else 0,
+        "chunked_fps": frames / chunked if chunked > 0 else 0
+    }
+
+def bench_prefilter(standard_poses, frames, variations, chunk):
+    """기준 포즈마다 변형을 variations개로 늘린 합성 라이브러리에서 2단계 매칭과 전체 계산을 비교합니다.
+
+    score_frames를 chunk 프레임씩 호출한 경우와 프레임마다 한 번씩 호출한 경우를 모두 측정합니다.
+    """
+    rng = np.random.default_rng(0)
+    library = {
+        idx: [bpa.normalize_pose(coords_list[i % len(coords_list)] + rng.normal(scale=0.05, size=(10, 3)))
+              for i in range(variations)]
+        for idx, coords_list in standard_poses.items()
+    }
+    stream = synthetic_landmark_stream(library, frames)
+    results = {"references": sum(len(coords_list) for coords_list in library.values()), "frames": frames}
+    for name, prefilter in (("full", False), ("prefiltered", True)):
+        reference_set = bpa.prepare_reference_set(library, prefilter=prefilter)
+        start = time.perf_counter()
+        evaluated = 0
+        for offset in range(0, frames, chunk):
+            final_similarity, _ = bpa.score_frames(stream[offset:offset + chunk], reference_set)
+            evaluated += int(np.count_nonzero(final_similarity))
+        elapsed = time.perf_counter() - start
+
+        # 분석 스캔은 프레임마다 한 번씩 호출하므로 단일 프레임 호출도 따로 측정합니다.
+        start = time.perf_counter()
+        for coords in stream:
+            bpa.score_frames(coords, reference_set)
+        per_frame = time.perf_counter() - start
+        results[name] = {
+            "fps": frames / elapsed if elapsed > 0 else 0,
+            "per_frame_fps": frames / per_frame if per_frame > 0 else 0,
+            "per_frame_microseconds": per_frame / frames * 1e6 if frames else 0,
+            "evaluated_fraction": evaluated / (frames * results["references"])
+        }
+    return results
+
+def bench_cold_start(video_path):
+    """새 인터프리터에서 모듈 import 시간과 CLI 전체 실행 시간을 측정합니다."""
+    script = os.path.join(bpa.PROJECT_ROOT, 'bowling_pose_analysis.py')
+    env = dict(os.environ)
+    user_id = f"benchmark{os.getpid()}"
+
+    # 인터프리터 시작 시간을 빼기 위해 자식 프로세스 안에서 import 시간만 측정합니다.
+    probe = (
+        "import json, sys, time\n"
+        "start = time.perf_counter()\n"
+        "import bowling_pose_analysis\n"
+        "elapsed = time.perf_counter() - start\n"
+        f"print(json.dumps([elapsed, [name for name in {HEAVY_MODULES!r} if name in sys.modules]]))\n"
+    )
+    start = time.perf_counter()
+    output = subprocess.run([sys.executable, "-c", probe], cwd=bpa.PROJECT_ROOT, env=env, check=True,
+                            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True).stdout
+    process_time = time.perf_counter() - start
+    import_time, heavy_modules = json.loads(output)
+
+    start = time.perf_counter()
+    subprocess.run([sys.executable, script, video_path, user_id, "--no-cache"], cwd=bpa.PROJECT_ROOT,
+                   env=env, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    run_time = time.perf_counter() - start
+
+    # CLI가 user_pose_data에 남긴 결과 이미지를 정리합니다.
+    for name in os.listdir(CLI_RESULT_FOLDER):
+        if name.startswith(f"{user_id}_"):
+            shutil.rmtree(os.path.join(CLI_RESULT_FOLDER, name), ignore_errors=True)
+
+    return {
+        "import_seconds": import_time,
+        "import_process_seconds": process_time,
+        "import_budget_seconds": IMPORT_TIME_BUDGET,
+        "within_import_budget": import_time <= IMPORT_TIME_BUDGET and not heavy_modules,
+        "heavy_modules_on_import": heavy_modules,
+        "cli_seconds": run_time,
+        "child_peak_rss_mb": peak_rss_mb(resource.RUSAGE_CHILDREN)
+    }
+
+def bench_warm(video_path, standard_poses, repeat):
+    """기준 포즈와 Pose 인스턴스를 재사용하는 상주 워커 방식의 분석 시간을 측정합니다."""
+    estimator = bpa.create_pose_estimator()
+    runs = []
+    try:
+        for _ in range(repeat):
+            timings = {}
+            start = time.perf_counter()
+            bpa.analyze_user_video(video_path, "benchmark", standard_poses=standard_poses,
+                                   estimator=estimator, timings=timings, cache=False)
+            runs.append({"seconds": time.perf_counter() - start, "timings": timings})
+    finally:
+        estimator.close()
+    return runs
+
+def main(argv=None):
+    """합성 데이터로 분석 파이프라인 벤치마크를 실행하고 결과를 JSON으로 저장합니다."""
+    parser = argparse.ArgumentParser(description="볼링 자세 분석 벤치마크")
+    parser.add_argument("--frames", type=int, default=120, help="합성 영상 프레임 수")
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--fps", type=float, default=30.0)
+    parser.add_argument("--repeat", type=int, default=2, help="상주 방식 분석 반복 횟수")
+    parser.add_argument("--synthetic-frames", type=int, default=5000, help="합성 랜드마크 스트림 길이")
+    parser.add_argument("--chunk", type=int, default=256, help="청크 단위 유사도 계산 크기")
+    parser.add_argument("--library-variations", type=int, default=100,
+                        help="2단계 매칭 비교에 사용할 포즈별 합성 변형 수")
+    parser.add_argument("--skip-cold", action="store_true", help="새 프로세스 실행 측정을 건너뜁니다.")
+    parser.add_argument("--check-import-budget", action="store_true",
+                        help=f"import 시간이 {IMPORT_TIME_BUDGET:g}초를 넘거나 무거운 모듈을 불러오면 종료 코드 1로 끝냅니다.")
+    parser.add_argument("--output", default=None, help="결과 JSON 경로 (기본값: benchmarks/<시각>.json)")
+    args = parser.parse_args(argv)
+    bpa.configure_logging()
+
+    standard_poses = bpa.load_standard_poses()
+    results = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "host": {
+            "platform": platform.platform(),
+            "python": platform.python_version(),
+            "cpu_count": os.cpu_count(),
+            "numpy": np.__version__,
+            "opencv": cv2.__version__
+        },
+        "config": vars(args)
+    }
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        video_path = os.path.join(tmp_dir, "benchmark.mp4")
+        generate_video(video_path, args.frames, args.width, args.height, args.fps)
+        # 상주 방식 분석의 결과 이미지는 임시 폴더에 저장합니다.
+        bpa.USER_POSE_DATA_FOLDER = tmp_dir
+
+        results["stages"] = bench_stages(video_path, standard_poses)
+        results["synthetic_scoring"] = bench_synthetic_scoring(standard_poses, args.synthetic_frames, args.chunk)
+        results["prefilter"] = bench_prefilter(standard_poses, args.synthetic_frames, args.library_variations, args.chunk)
+        results["warm_runs"] = bench_warm(video_path, standard_poses, args.repeat)
+        if not args.skip_cold:
+            results["cold_start"] = bench_cold_start(video_path)
+    results["peak_rss_mb"] = peak_rss_mb()
+    results["metrics"] = bpa.metrics.snapshot()
+
+    output = args.output
+    if output is None:
+        os.makedirs(BENCHMARK_RESULT_FOLDER, exist_ok=True)
+        output = os.path.join(BENCHMARK_RESULT_FOLDER, f"{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, ensure_ascii=False, indent=4)
+    print(json.dumps(results, ensure_ascii=False, indent=4))
+    print(f"결과 저장: {output}", file=sys.stderr)
+    if args.check_import_budget and "cold_start" in results and not results["cold_start"]["within_import_budget"]:
+        print(f"import 시간 예산 초과: {results['cold_start']['import_seconds']:.3f}초, "
+              f"불러온 모듈: {results['cold_start']['heavy_modules_on_import']}", file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
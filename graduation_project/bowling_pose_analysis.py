@@ -1,31 +1,87 @@
-import cv2
-import mediapipe as mp
 import numpy as np
 import os
 import sys
 import json
-from scipy.spatial.distance import cosine, euclidean
-from scipy.spatial import procrustes
+import hashlib
+import uuid
+import shutil
+import argparse
+import csv
+import multiprocessing
+from multiprocessing import cpu_count
+import queue
+import threading
+import time
+import bisect
+import contextlib
+import platform
 from datetime import datetime
-from multiprocessing import Pool, cpu_count
 import logging
 
-# 설정: 로깅 설정
-logging.basicConfig(
-    filename='pose_analysis.log',
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
-
-# Mediapipe 설정 조정
-mp_pose = mp.solutions.pose
-pose = mp_pose.Pose(
-    static_image_mode=False,
-    model_complexity=1,
-    smooth_landmarks=True,
-    min_detection_confidence=0.8,
-    min_tracking_confidence=0.7
-)
+# 설정: 로깅 설정 (import 시점이 아니라 실행 진입점에서 configure_logging으로 적용)
+LOG_FILE = 'pose_analysis.log'
+# 같은 종류의 반복 로그는 이 간격(초)에 한 번만 기록합니다.
+LOG_RATE_LIMIT_SECONDS = 10.0
+
+def configure_logging(log_file=LOG_FILE):
+    """분석 로그를 log_file에 기록하도록 설정합니다."""
+    logging.basicConfig(
+        filename=log_file,
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s'
+    )
+
+# cv2, mediapipe, scipy는 import에 시간이 오래 걸리므로 실제로 사용하는 함수 안에서 불러옵니다.
+# 사용법 오류나 캐시만 읽는 작업, 추론하지 않는 워커 프로세스는 이 모듈들을 불러오지 않습니다.
+
+# 기본 모델 복잡도 (0: lite, 1: full, 2: heavy)
+DEFAULT_MODEL_COMPLEXITY = 1
+
+def create_pose_estimator(model_complexity=DEFAULT_MODEL_COMPLEXITY):
+    """추적 상태가 비어 있는 새 Mediapipe Pose 인스턴스를 생성합니다."""
+    import mediapipe as mp
+    return mp.solutions.pose.Pose(
+        static_image_mode=False,
+        model_complexity=model_complexity,
+        smooth_landmarks=True,
+        min_detection_confidence=0.8,
+        min_tracking_confidence=0.7
+    )
+
+# 프로세스별 모델 복잡도마다 하나씩 두는 기본 Pose 인스턴스 (get_default_estimator에서 처음 사용할 때 생성)
+_default_estimator_state = {"pid": None, "estimators": {}}
+
+def get_default_estimator(model_complexity=DEFAULT_MODEL_COMPLEXITY):
+    """현재 프로세스의 기본 Pose 인스턴스를 반환합니다.
+
+    처음 호출할 때 생성하며, fork된 자식 프로세스는 부모의 그래프를 이어 쓰지 않고 새로 만듭니다.
+    """
+    if _default_estimator_state["pid"] != os.getpid():
+        _default_estimator_state["estimators"] = {}
+        _default_estimator_state["pid"] = os.getpid()
+    estimators = _default_estimator_state["estimators"]
+    if model_complexity not in estimators:
+        estimators[model_complexity] = create_pose_estimator(model_complexity)
+    return estimators[model_complexity]
+
+# 모델 복잡도별 사용 가능 여부 (model_available에서 처음 확인할 때 기록)
+_model_availability = {}
+
+def model_available(model_complexity):
+    """모델 복잡도 model_complexity의 Pose 모델을 사용할 수 있는지 확인합니다.
+
+    lite/heavy 모델은 Mediapipe 패키지에 포함되지 않아 처음 사용할 때 내려받으므로,
+    내려받을 수 없는 환경에서는 False를 반환합니다. 내려받기 안내 문구가 표준 출력(작업 응답)에 섞이지 않게 합니다.
+    """
+    if model_complexity not in _model_availability:
+        try:
+            with contextlib.redirect_stdout(sys.stderr):
+                get_default_estimator(model_complexity)
+            _model_availability[model_complexity] = True
+        except Exception as e:
+            logging.warning(f"모델 복잡도 {model_complexity}의 Pose 모델을 사용할 수 없습니다: {e}")
+            _model_availability[model_complexity] = False
+    return _model_availability[model_complexity]
 
 # 프로젝트 루트 디렉토리를 기준으로 상대 경로 설정
 PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
@@ -34,25 +90,426 @@ PROFESSIONAL_POSE_FOLDER = os.path.join(PROJECT_ROOT, 'professional_poses')
 # 사용자 포즈 데이터 저장 폴더
 USER_POSE_DATA_FOLDER = os.path.join(PROJECT_ROOT, 'user_pose_data')
 
+class PoseAnalysisError(Exception):
+    """영상 분석을 계속할 수 없을 때 발생하는 예외."""
+
 # 사용할 랜드마크 인덱스 (얼굴 제외)
 USED_LANDMARKS = [11, 12, 13, 14, 15, 16, 23, 24, 25, 26]
 
-def extract_landmarks_from_image(image):
-    """이미지에서 상체 및 허벅지 랜드마크를 추출합니다."""
+# 배치 분석 설정
+BATCH_RESULT_FOLDER = os.path.join(USER_POSE_DATA_FOLDER, 'batch_results')
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mpeg', '.mov')
+
+# 프레임 샘플링 설정
+SAMPLING_MODES = ('all', 'stride', 'fps', 'adaptive')
+DEFAULT_VIDEO_FPS = 30.0
+DEFAULT_TARGET_FPS = 10.0
+# 적응형 샘플링: 원본 프레임 1개당 랜드마크 이동량/유사도 변화량이 이 값을 넘으면 모든 프레임을 분석합니다.
+ADAPTIVE_MOTION_THRESHOLD = 0.01
+ADAPTIVE_SIMILARITY_THRESHOLD = 0.005
+
+# 포즈 인정 기준: 유사도 임계값과 원본 프레임 기준 연속 조건.
+# 샘플링 시에는 같은 시간(CONSECUTIVE_REQUIRED / fps초) 동안 유지되어야 합니다.
+SIMILARITY_THRESHOLD = 0.8
+CONSECUTIVE_REQUIRED = 3
+
+# 진행 상황 이벤트 간격(분석 프레임 수)과 조기 종료 조건:
+# 모든 포즈의 유지된 최고 평균 유사도가 EARLY_STOP_SIMILARITY 이상이고 EARLY_STOP_PATIENCE 프레임 동안 갱신되지 않으면 종료
+PROGRESS_INTERVAL = 30
+EARLY_STOP_SIMILARITY = 0.9
+EARLY_STOP_PATIENCE = 15
+
+# 파이프라인 처리 설정
+PIPELINE_STAGES = ('decode', 'inference', 'scoring', 'aggregation')
+PIPELINE_QUEUE_SIZE = 8
+_PIPELINE_END = object()
+# 결과 프레임을 다시 읽을 때 이 간격보다 멀면 순차 디코딩 대신 탐색합니다.
+FRAME_SEEK_DISTANCE = 30
+
+# 영상 분할 분석: 구간마다 앞쪽 SHARD_WARMUP_SECONDS 동안 추론만 하여 추적 상태를 준비하고,
+# 구간 하나가 SHARD_MIN_SECONDS보다 짧아지지 않도록 구간 수를 제한합니다.
+# Mediapipe 추적 결과는 이전 프레임에 따라 달라지므로, 경계 직후의 랜드마크는 나누지 않은 경우와 조금 다를 수 있습니다.
+SHARD_WARMUP_SECONDS = 1.0
+SHARD_MIN_SECONDS = 5.0
+
+# ROI 추론: ROI 추론 입력과 전체 화면 탐색 입력의 긴 변 길이(px), 랜드마크 경계 상자에 더할 여백 비율,
+# 영역을 다시 잡는 가장자리 비율, 영역 계산에 사용할 랜드마크의 최소 visibility, 최소 영역 크기(px)
+ROI_INFERENCE_SIZE = 640
+ROI_SEARCH_SIZE = 1280
+ROI_PADDING = 1.0
+ROI_EDGE_MARGIN = 0.1
+ROI_VISIBILITY_THRESHOLD = 0.5
+ROI_MIN_SIZE = 32
+
+# 품질 등급: 정확도가 높은 순서이며, 등급마다 모델 복잡도, 초당 분석 프레임 수(None이면 모든 프레임),
+# 최고 유사도 프레임 주변을 heavy 모델로 다시 추론할지 여부를 정합니다.
+QUALITY_TIERS = ('accurate', 'balanced', 'fast')
+TIER_SETTINGS = {
+    'accurate': {"model_complexity": 1, "target_fps": None, "escalate": True},
+    'balanced': {"model_complexity": 1, "target_fps": 15.0, "escalate": False},
+    'fast': {"model_complexity": 0, "target_fps": 10.0, "escalate": False}
+}
+# 시간 예산에 맞추기 위해 fast 등급의 초당 분석 프레임 수를 낮출 수 있는 하한
+MIN_TARGET_FPS = 2.0
+# 포즈별 최고 유사도 프레임 앞뒤로 다시 추론할 범위(초)와 사용할 모델 복잡도
+ESCALATION_WINDOW_SECONDS = 0.25
+ESCALATION_MODEL_COMPLEXITY = 2
+# 이 호스트에서 측정한 모델 복잡도별 분석 프레임당/디코딩 프레임당 처리 시간(초)의 지수 이동 평균.
+# 측정값이 없으면 DEFAULT_FRAME_SECONDS, DEFAULT_DECODE_SECONDS로 추정합니다.
+THROUGHPUT_PROFILE_PATH = os.path.join(PROJECT_ROOT, 'models', 'throughput.json')
+THROUGHPUT_SMOOTHING = 0.3
+DEFAULT_FRAME_SECONDS = {0: 0.015, 1: 0.025, 2: 0.075}
+DEFAULT_DECODE_SECONDS = 0.001
+
+# 프레임별 랜드마크 트랙 (결과 폴더에 저장)
+TRACK_FILENAME = 'landmarks.npz'
+TRACK_VERSION = 1
+RESCORE_FILENAME = 'rescored.json'
+
+# 결과 이미지: 저장 형식, 긴 변 최대 길이(px), 인코딩 품질(0~100), 썸네일 긴 변 길이(px, None이면 만들지 않음)
+OUTPUT_IMAGE_FORMATS = ('jpg', 'webp')
+OUTPUT_IMAGE_FORMAT = 'jpg'
+OUTPUT_IMAGE_MAX_SIZE = 1280
+OUTPUT_IMAGE_QUALITY = 85
+OUTPUT_THUMBNAIL_SIZE = None
+
+# 분석 결과 캐시: 영상 내용, 기준 포즈, 채점 설정이 같으면 저장된 comments와 이미지를 그대로 반환합니다.
+# 유사도 계산이나 피드백 문구가 바뀌면 RESULT_CACHE_VERSION을 올립니다.
+RESULT_CACHE_FOLDER = os.path.join(USER_POSE_DATA_FOLDER, 'result_cache')
+RESULT_CACHE_VERSION = 1
+RESULT_CACHE_FILENAME = 'comments.json'
+RESULT_CACHE_MAX_BYTES = 512 * 1024 * 1024
+RESULT_CACHE_MAX_AGE_SECONDS = 30 * 24 * 3600
+
+# 2단계 매칭: 한 번의 score_frames 호출에서 비교할 (프레임 수 × 기준 포즈 수)가 이 값 이상이면
+# 저차원 투영으로 후보를 먼저 거릅니다. 측정상 손익분기점은 3000~6000 사이로, 프레임마다 호출하는 스캔은
+# 기준 포즈가 수천 개일 때만, 청크 단위로 호출하는 재평가/시퀀스 매칭은 기본 라이브러리에서도 2단계 매칭을 씁니다.
+PREFILTER_MIN_COMPARISONS = 4096
+PREFILTER_DIMENSIONS = 6
+PREFILTER_TOLERANCE = 1e-9
+
+# 시퀀스 매칭: 포즈 결정 방식, 유사도를 한 번에 계산할 프레임 수,
+# 이웃한 두 포즈 사이의 최대 간격(초)
+MATCHERS = ('frame', 'sequence')
+SEQUENCE_CHUNK_FRAMES = 256
+SEQUENCE_MAX_GAP_SECONDS = 2.0
+
+# 지표 이름 접두사와 단계별 지연 시간 히스토그램 구간(초), 샘플링 프로파일러 기본 간격(초)
+METRICS_PREFIX = 'pose_analysis'
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+PROFILE_INTERVAL = 0.005
+
+# 기준 포즈 랜드마크 캐시 (이미지 해시 및 USED_LANDMARKS 기준으로 자동 재생성)
+REFERENCE_CACHE_PATH = os.path.join(PROJECT_ROOT, 'models', 'reference_landmarks.npz')
+REFERENCE_CACHE_VERSION = 1
+
+def _prometheus_labels(labels, extra=()):
+    """(이름, 값) 쌍 목록을 Prometheus 레이블 문자열로 변환합니다."""
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    escaped = [(key, str(value).replace('\\', '\\\\').replace('"', '\\"')) for key, value in pairs]
+    return "{" + ",".join(f'{key}="{value}"' for key, value in escaped) + "}"
+
+class MetricsRegistry:
+    """분석 과정의 카운터와 히스토그램을 모아 Prometheus 텍스트 또는 JSON 요약으로 내보냅니다.
+
+    파이프라인의 여러 스레드에서 함께 기록할 수 있도록 잠금으로 보호합니다.
+    """
+
+    def __init__(self, prefix=METRICS_PREFIX, buckets=LATENCY_BUCKETS):
+        self.prefix = prefix
+        self.buckets = tuple(buckets)
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+
+    def reset(self):
+        """기록된 값을 모두 지웁니다."""
+        with self.lock:
+            self.counters = {}
+            self.histograms = {}
+
+    def inc(self, name, value=1, **labels):
+        """카운터 name을 value만큼 증가시킵니다."""
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        """히스토그램 name에 측정값 value를 기록합니다."""
+        key = (name, tuple(sorted(labels.items())))
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = {"buckets": [0] * (len(self.buckets) + 1), "sum": 0.0, "count": 0}
+            histogram["buckets"][index] += 1
+            histogram["sum"] += value
+            histogram["count"] += 1
+
+    def snapshot(self):
+        """JSON으로 저장할 수 있는 요약을 반환합니다. 히스토그램 구간 값은 누적 개수입니다."""
+        with self.lock:
+            counters = [
+                {"name": name, "labels": dict(labels), "value": value}
+                for (name, labels), value in sorted(self.counters.items())
+            ]
+            histograms = []
+            for (name, labels), histogram in sorted(self.histograms.items()):
+                cumulative = np.cumsum(histogram["buckets"]).tolist()
+                histograms.append({
+                    "name": name,
+                    "labels": dict(labels),
+                    "count": histogram["count"],
+                    "sum": histogram["sum"],
+                    "mean": histogram["sum"] / histogram["count"] if histogram["count"] else 0.0,
+                    "buckets": dict(zip([f"{bound:g}" for bound in self.buckets] + ["+Inf"], cumulative))
+                })
+        return {"counters": counters, "histograms": histograms}
+
+    def to_prometheus(self):
+        """Prometheus 텍스트 노출 형식 문자열을 반환합니다."""
+        lines = []
+        with self.lock:
+            declared = set()
+            for (name, labels), value in sorted(self.counters.items()):
+                metric = f"{self.prefix}_{name}_total"
+                if metric not in declared:
+                    lines.append(f"# TYPE {metric} counter")
+                    declared.add(metric)
+                lines.append(f"{metric}{_prometheus_labels(labels)} {value}")
+            for (name, labels), histogram in sorted(self.histograms.items()):
+                metric = f"{self.prefix}_{name}"
+                if metric not in declared:
+                    lines.append(f"# TYPE {metric} histogram")
+                    declared.add(metric)
+                cumulative = 0
+                for bound, count in zip([f"{bound:g}" for bound in self.buckets] + ["+Inf"], histogram["buckets"]):
+                    cumulative += count
+                    lines.append(f"{metric}_bucket{_prometheus_labels(labels, [('le', bound)])} {cumulative}")
+                lines.append(f"{metric}_sum{_prometheus_labels(labels)} {histogram['sum']}")
+                lines.append(f"{metric}_count{_prometheus_labels(labels)} {histogram['count']}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path):
+        """path가 .json이면 JSON 요약을, 아니면 Prometheus 텍스트 파일을 원자적으로 저장합니다."""
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            if path.endswith('.json'):
+                json.dump(self.snapshot(), f, ensure_ascii=False, indent=4)
+            else:
+                f.write(self.to_prometheus())
+        os.replace(tmp_path, path)
+
+metrics = MetricsRegistry()
+
+_rate_limited_log_state = {}
+_rate_limited_log_lock = threading.Lock()
+
+def log_rate_limited(key, level, message, interval=LOG_RATE_LIMIT_SECONDS):
+    """같은 key의 로그는 interval초에 한 번만 기록하고, 그 사이 생략된 횟수를 다음 기록에 덧붙입니다."""
+    now = time.monotonic()
+    with _rate_limited_log_lock:
+        last, suppressed = _rate_limited_log_state.get(key, (None, 0))
+        if last is not None and now - last < interval:
+            _rate_limited_log_state[key] = (last, suppressed + 1)
+            return
+        _rate_limited_log_state[key] = (now, 0)
+    if suppressed:
+        message = f"{message} (직전 {interval:g}초 동안 {suppressed}회 생략)"
+    logging.log(level, message)
+
+class SamplingProfiler:
+    """interval초마다 다른 스레드들의 파이썬 호출 스택을 샘플링합니다.
+
+    결과는 접힌 스택(folded stacks) 형식으로 저장되어 flamegraph.pl이나 speedscope로 바로 볼 수 있습니다.
+    Mediapipe 그래프 내부(C++)는 보이지 않으며, process 호출에 머문 시간으로 나타납니다.
+    """
+
+    def __init__(self, interval=PROFILE_INTERVAL):
+        self.interval = interval
+        self.samples = {}
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self.stop_event.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(f"{frame.f_code.co_name} ({os.path.basename(frame.f_code.co_filename)})")
+                    frame = frame.f_back
+                key = ";".join(reversed(stack))
+                self.samples[key] = self.samples.get(key, 0) + 1
+
+    def start(self):
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def write(self, path):
+        """샘플 수가 많은 스택부터 "스택 샘플수" 형식으로 저장합니다."""
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in sorted(self.samples.items(), key=lambda item: -item[1]):
+                f.write(f"{stack} {count}\n")
+
+def extract_landmarks_from_image(image, estimator=None, roi=None):
+    """이미지에서 상체 및 허벅지 랜드마크를 추출합니다.
+
+    roi에 RoiTracker를 넘기면 이전 프레임의 선수 주변 영역만 축소하여 추론합니다.
+    """
+    import cv2
+    if estimator is None:
+        estimator = get_default_estimator()
     try:
-        image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-        results = pose.process(image_rgb)
-        if results.pose_landmarks:
-            landmarks = results.pose_landmarks.landmark
-            selected_landmarks = [landmarks[idx] for idx in USED_LANDMARKS]
-            landmark_array = np.array([[lm.x, lm.y, lm.z] for lm in selected_landmarks])
-            return landmark_array
+        if roi is not None:
+            landmark_array = roi.extract(image, estimator)
         else:
-            logging.warning("포즈 랜드마크를 인식하지 못했습니다.")
-            return None
+            image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+            results = estimator.process(image_rgb)
+            landmark_array = None
+            if results.pose_landmarks:
+                landmarks = results.pose_landmarks.landmark
+                selected_landmarks = [landmarks[idx] for idx in USED_LANDMARKS]
+                landmark_array = np.array([[lm.x, lm.y, lm.z] for lm in selected_landmarks])
     except Exception as e:
-        logging.error(f"랜드마크 추출 중 오류 발생: {e}")
+        metrics.inc("landmark_errors")
+        log_rate_limited("landmark_error", logging.ERROR, f"랜드마크 추출 중 오류 발생: {e}")
         return None
+    if landmark_array is None:
+        # 프레임마다 기록하면 긴 영상에서 로그 쓰기가 병목이 되므로 횟수는 지표로 세고 로그는 주기적으로만 남깁니다.
+        metrics.inc("detection_misses")
+        log_rate_limited("detection_miss", logging.WARNING, "포즈 랜드마크를 인식하지 못했습니다.")
+    else:
+        metrics.inc("detections")
+    return landmark_array
+
+class RoiTracker:
+    """이전 프레임의 랜드마크로 선수 주변 영역(ROI)을 잘라 고정 해상도로 축소한 뒤 추론합니다.
+
+    랜드마크는 원본 프레임 기준 정규화 좌표로 되돌려 반환하므로 이후 처리는 전체 프레임 추론과 같습니다.
+    ROI에서 선수를 놓치면 같은 프레임을 전체 화면(긴 변 search_size로 축소)에서 다시 찾습니다.
+    """
+
+    def __init__(self, inference_size=ROI_INFERENCE_SIZE, padding=ROI_PADDING, search_size=ROI_SEARCH_SIZE):
+        self.inference_size = inference_size
+        self.search_size = search_size
+        self.padding = padding
+        self.box = None
+        self.region = None
+        self.roi_frames = 0
+        self.full_frame_searches = 0
+
+    def reset(self):
+        """추적 중인 영역을 지워 다음 프레임은 전체 화면에서 찾도록 합니다."""
+        self.box = None
+        self.region = None
+
+    def _process(self, image, box, estimator, max_size):
+        """box 영역을 잘라 긴 변 max_size 이하로 축소해 추론하고 33개 랜드마크의 (x, y, z, visibility)를 원본 프레임 기준으로 반환합니다."""
+        import cv2
+        full_frame = box == (0, 0, image.shape[1], image.shape[0])
+        if full_frame != self.region:
+            # Mediapipe 내부 추적 영역은 이전 입력 기준 좌표이므로 전체 화면과 ROI 사이를 오갈 때만 초기화합니다.
+            # ROI를 조금 옮기는 경우는 내부 추적 영역의 여백 안에 들어오므로 추적 상태를 유지해 재검출을 피합니다.
+            estimator.reset()
+        self.region = full_frame
+        x0, y0, x1, y1 = box
+        crop = image[y0:y1, x0:x1]
+        crop_height, crop_width = crop.shape[:2]
+        scale = max_size / max(crop_height, crop_width)
+        if scale < 1:
+            # 색 변환과 추론 모두 축소된 영상에서 수행합니다.
+            # Mediapipe가 다시 256px 안팎으로 줄이므로 INTER_AREA 대신 훨씬 빠른 INTER_LINEAR로 충분합니다.
+            crop = cv2.resize(crop, (max(1, round(crop_width * scale)), max(1, round(crop_height * scale))),
+                              interpolation=cv2.INTER_LINEAR)
+        results = estimator.process(cv2.cvtColor(crop, cv2.COLOR_BGR2RGB))
+        if not results.pose_landmarks:
+            return None
+
+        # Mediapipe 좌표(float32)를 float32 그대로 변환하여 트랙 저장 시 값이 바뀌지 않게 합니다.
+        height, width = image.shape[:2]
+        points = np.array([[lm.x, lm.y, lm.z, lm.visibility] for lm in results.pose_landmarks.landmark],
+                          dtype=np.float32)
+        points[:, 0] = (np.float32(x0) + points[:, 0] * np.float32(crop_width)) / np.float32(width)
+        points[:, 1] = (np.float32(y0) + points[:, 1] * np.float32(crop_height)) / np.float32(height)
+        # z는 입력 영상 너비 기준이므로 너비 비율만큼 조정합니다.
+        points[:, 2] *= np.float32(crop_width) / np.float32(width)
+        return points
+
+    def _visible_pixels(self, points, width, height):
+        """보이는 랜드마크의 픽셀 좌표 (N, 2)를 반환합니다. 보이는 점이 부족하면 모든 점을 사용합니다."""
+        visible = points[points[:, 3] >= ROI_VISIBILITY_THRESHOLD]
+        if len(visible) < 2:
+            visible = points
+        return visible[:, :2] * np.array([width, height])
+
+    def _box_around(self, points, width, height):
+        """랜드마크 경계 상자를 중심으로 여백을 더한 정사각형 영역을 반환합니다. 영역이 너무 작으면 None입니다."""
+        pixels = self._visible_pixels(points, width, height)
+        left, top = pixels.min(axis=0)
+        right, bottom = pixels.max(axis=0)
+        # Mediapipe 검출기는 정사각형 입력을 사용하므로 정사각형으로 잘라 왜곡 없이 축소되게 합니다.
+        half = (1 + 2 * self.padding) * max(right - left, bottom - top) / 2
+        center_x, center_y = (left + right) / 2, (top + bottom) / 2
+        box = (
+            int(max(0, np.floor(center_x - half))),
+            int(max(0, np.floor(center_y - half))),
+            int(min(width, np.ceil(center_x + half))),
+            int(min(height, np.ceil(center_y + half)))
+        )
+        if box[2] - box[0] < ROI_MIN_SIZE or box[3] - box[1] < ROI_MIN_SIZE:
+            return None
+        return box
+
+    def _near_edge(self, points, width, height):
+        """보이는 랜드마크가 현재 영역의 가장자리 가까이에 있는지 확인합니다."""
+        x0, y0, x1, y1 = self.box
+        margin_x = ROI_EDGE_MARGIN * (x1 - x0)
+        margin_y = ROI_EDGE_MARGIN * (y1 - y0)
+        pixels = self._visible_pixels(points, width, height)
+        return bool(
+            pixels[:, 0].min() < x0 + margin_x or pixels[:, 0].max() > x1 - margin_x
+            or pixels[:, 1].min() < y0 + margin_y or pixels[:, 1].max() > y1 - margin_y
+        )
+
+    def extract(self, image, estimator):
+        """이미지에서 USED_LANDMARKS 랜드마크 배열을 추출합니다. 인식하지 못하면 None을 반환합니다."""
+        height, width = image.shape[:2]
+        points = None
+        if self.box is not None:
+            self.roi_frames += 1
+            points = self._process(image, self.box, estimator, self.inference_size)
+            if points is None:
+                # 추적 실패: 같은 프레임을 전체 화면에서 다시 찾습니다.
+                self.box = None
+        if points is None:
+            self.full_frame_searches += 1
+            points = self._process(image, (0, 0, width, height), estimator, self.search_size)
+            if points is None:
+                return None
+            self.box = self._box_around(points, width, height)
+        elif self._near_edge(points, width, height):
+            # 영역이 바뀔 때마다 검출을 다시 하므로 선수가 가장자리에 가까워질 때만 영역을 다시 잡습니다.
+            self.box = self._box_around(points, width, height)
+        return points[USED_LANDMARKS, :3].astype(np.float64)
 
 def normalize_pose(coords):
     """포즈를 정규화합니다."""
@@ -69,7 +526,7 @@ def normalize_pose(coords):
             coords_normalized = coords_centered
         return coords_normalized
     except Exception as e:
-        logging.error(f"포즈 정규화 중 오류 발생: {e}")
+        log_rate_limited("normalize_error", logging.ERROR, f"포즈 정규화 중 오류 발생: {e}")
         return coords
 
 def calculate_hip_flexion_angle(coords):
@@ -147,6 +604,7 @@ def calculate_wrist_relative_height(coords):
 
 def apply_procrustes(user_coords, standard_coords):
     """프로크루스테스 분석을 적용하여 포즈를 정렬합니다."""
+    from scipy.spatial import procrustes
     try:
         mtx1, mtx2, disparity = procrustes(standard_coords, user_coords)
         return mtx1, mtx2, disparity
@@ -156,6 +614,7 @@ def apply_procrustes(user_coords, standard_coords):
 
 def calculate_comprehensive_similarity(user_coords, standard_coords):
     """종합적인 포즈 유사도를 계산합니다."""
+    from scipy.spatial.distance import cosine, euclidean
     try:
         cosine_sim = 1 - cosine(user_coords.flatten(), standard_coords.flatten())
         euclidean_dist = euclidean(user_coords.flatten(), standard_coords.flatten())
@@ -200,8 +659,65 @@ def calculate_comprehensive_similarity(user_coords, standard_coords):
         logging.error(f"종합 유사도 계산 중 오류 발생: {e}")
         return 0, {}
 
-def load_standard_poses():
-    """기준 포즈를 로드하고 정규화합니다."""
+def batch_hip_flexion_angle(coords):
+    """(..., 10, 3) 배열에 대해 고관절 접힘 각도를 한 번에 계산합니다."""
+    angles = []
+    for shoulder_idx, hip_idx, knee_idx in ((0, 6, 8), (1, 7, 9)):
+        upper_leg = coords[..., hip_idx, :] - coords[..., shoulder_idx, :]
+        lower_leg = coords[..., knee_idx, :] - coords[..., hip_idx, :]
+        norm_upper = np.linalg.norm(upper_leg, axis=-1)
+        norm_lower = np.linalg.norm(lower_leg, axis=-1)
+        degenerate = (norm_upper == 0) | (norm_lower == 0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            unit_upper = upper_leg / norm_upper[..., None]
+            unit_lower = lower_leg / norm_lower[..., None]
+            cos_angle = np.clip(np.sum(unit_upper * unit_lower, axis=-1), -1.0, 1.0)
+            angle_deg = np.degrees(np.arccos(cos_angle))
+        angles.append(np.where(degenerate, 0.0, angle_deg))
+    return (angles[0] + angles[1]) / 2
+
+def batch_relative_positions(coords):
+    """(..., 10, 3) 배열에 대해 머리-어깨, 어깨-무릎 상대 거리를 한 번에 계산합니다."""
+    left_shoulder = coords[..., 0, :]
+    right_shoulder = coords[..., 1, :]
+    head_top = (left_shoulder + right_shoulder) / 2 + np.array([0, -0.1, 0])
+
+    left_distance = np.linalg.norm(left_shoulder - coords[..., 8, :], axis=-1)
+    right_distance = np.linalg.norm(right_shoulder - coords[..., 9, :], axis=-1)
+
+    relative_head_shoulder = np.linalg.norm(head_top - left_shoulder, axis=-1) + np.linalg.norm(head_top - right_shoulder, axis=-1)
+    relative_shoulder_knee = left_distance + right_distance
+    return relative_head_shoulder, relative_shoulder_knee
+
+def batch_wrist_relative_height(coords):
+    """(..., 10, 3) 배열에 대해 좌우 팔의 상대적 높이를 한 번에 계산합니다."""
+    left_arm_height = coords[..., 0, 1] - coords[..., 4, 1]
+    right_arm_height = coords[..., 1, 1] - coords[..., 5, 1]
+    return left_arm_height, right_arm_height
+
+def reference_image_paths():
+    """기준 포즈 이미지 경로 목록을 (포즈 번호, 변형 번호, 경로) 형태로 반환합니다."""
+    return [
+        (idx, variation, os.path.join(PROFESSIONAL_POSE_FOLDER, f'pose{idx}-{variation}.jpg'))
+        for idx in range(1, 7)
+        for variation in range(1, 5)
+    ]
+
+def file_sha1(path):
+    """파일 내용의 SHA-1 해시를 계산합니다. 파일이 없으면 빈 문자열을 반환합니다."""
+    if not os.path.exists(path):
+        return ""
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def extract_standard_poses():
+    """기준 이미지에서 랜드마크를 직접 추출하여 정규화합니다."""
+    import cv2
+    # 캐시 여부와 관계없이 같은 결과가 나오도록 항상 새 추적 상태에서 추출합니다.
+    estimator = create_pose_estimator()
     standard_poses = {}
     for idx in range(1, 7):
         pose_images = []
@@ -214,7 +730,7 @@ def load_standard_poses():
             if image is None:
                 logging.error(f"기준 이미지를 로드할 수 없습니다: {image_path}")
                 continue
-            coords = extract_landmarks_from_image(image)
+            coords = extract_landmarks_from_image(image, estimator)
             if coords is not None:
                 coords = normalize_pose(coords)
                 pose_images.append(coords)
@@ -224,10 +740,259 @@ def load_standard_poses():
             standard_poses[idx] = pose_images
         else:
             logging.error(f"포즈 {idx}에 대한 기준 이미지가 없습니다.")
+    estimator.close()
+    return standard_poses
+
+def build_reference_cache(cache_path=REFERENCE_CACHE_PATH):
+    """기준 포즈 랜드마크를 추출하여 캐시 파일로 저장하고 결과를 반환합니다."""
+    hashes = [file_sha1(path) for _, _, path in reference_image_paths()]
+    standard_poses = extract_standard_poses()
+
+    pose_ids, coords_list = [], []
+    for idx, coords_for_pose in standard_poses.items():
+        for coords in coords_for_pose:
+            pose_ids.append(idx)
+            coords_list.append(coords)
+    coords_array = np.array(coords_list, dtype=np.float64).reshape(-1, len(USED_LANDMARKS), 3)
+
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            np.savez(
+                f,
+                version=np.array(REFERENCE_CACHE_VERSION),
+                used_landmarks=np.array(USED_LANDMARKS),
+                image_hashes=np.array(hashes),
+                pose_ids=np.array(pose_ids, dtype=np.int64),
+                coords=coords_array
+            )
+        os.replace(tmp_path, cache_path)
+        logging.info(f"기준 포즈 캐시를 저장했습니다: {cache_path}")
+    except OSError as e:
+        logging.error(f"기준 포즈 캐시 저장 중 오류 발생: {e}")
     return standard_poses
 
+def load_reference_cache(cache_path=REFERENCE_CACHE_PATH):
+    """캐시된 기준 포즈를 로드합니다. 캐시가 없거나 오래된 경우 None을 반환합니다."""
+    if not os.path.exists(cache_path):
+        return None
+    try:
+        with np.load(cache_path, allow_pickle=False) as data:
+            if int(data['version']) != REFERENCE_CACHE_VERSION:
+                return None
+            if data['used_landmarks'].tolist() != USED_LANDMARKS:
+                return None
+            hashes = [file_sha1(path) for _, _, path in reference_image_paths()]
+            if data['image_hashes'].tolist() != hashes:
+                logging.info("기준 이미지가 변경되어 캐시를 다시 생성합니다.")
+                return None
+            pose_ids = data['pose_ids']
+            coords = data['coords']
+    except Exception as e:
+        logging.warning(f"기준 포즈 캐시를 읽을 수 없습니다: {e}")
+        return None
+
+    standard_poses = {}
+    for idx, pose_coords in zip(pose_ids.tolist(), coords):
+        standard_poses.setdefault(idx, []).append(pose_coords)
+    return standard_poses
+
+def load_standard_poses(use_cache=True):
+    """기준 포즈를 로드하고 정규화합니다. 유효한 캐시가 있으면 캐시를 사용합니다."""
+    if not use_cache:
+        return extract_standard_poses()
+    standard_poses = load_reference_cache()
+    if standard_poses is None:
+        standard_poses = build_reference_cache()
+    return standard_poses
+
+def prepare_reference_set(standard_poses, prefilter=None):
+    """기준 포즈를 (P, V, 10, 3) 텐서로 쌓고 유사도 계산에 쓰이는 특징을 미리 계산합니다.
+
+    포즈마다 변형 수가 다를 수 있으므로 앞에서부터 채우고, 빈 자리는 mask로 표시합니다.
+    prefilter가 None이면 score_frames가 호출마다 비교 수(PREFILTER_MIN_COMPARISONS 참고)를 보고 2단계 매칭 사용 여부를 정합니다.
+    """
+    pose_ids = list(standard_poses.keys())
+    max_variations = max((len(coords_list) for coords_list in standard_poses.values()), default=0)
+    coords = np.zeros((len(pose_ids), max_variations, len(USED_LANDMARKS), 3))
+    mask = np.zeros((len(pose_ids), max_variations), dtype=bool)
+    for p, idx in enumerate(pose_ids):
+        for v, standard_coords in enumerate(standard_poses[idx]):
+            coords[p, v] = standard_coords
+            mask[p, v] = True
+
+    flat = coords.reshape(len(pose_ids), max_variations, -1)
+    head_shoulder, shoulder_knee = batch_relative_positions(coords)
+    left_arm, right_arm = batch_wrist_relative_height(coords)
+
+    # 2단계 매칭용 저차원 투영: 정규직교 기저로의 투영은 거리를 줄이기만 하므로
+    # 투영 공간의 거리는 실제 유클리드 거리의 하한이 됩니다.
+    valid_flat = flat[mask]
+    if len(valid_flat) > 1:
+        _, _, vt = np.linalg.svd(valid_flat - valid_flat.mean(axis=0), full_matrices=False)
+        basis = vt[:PREFILTER_DIMENSIONS].T
+    else:
+        basis = np.zeros((flat.shape[-1], 0))
+
+    return {
+        "pose_ids": pose_ids,
+        "standard_poses": standard_poses,
+        "coords": coords,
+        "mask": mask,
+        "counts": mask.sum(axis=1),
+        "flat": flat,
+        "sq_norm": np.sum(flat * flat, axis=-1),
+        "hip_angle": batch_hip_flexion_angle(coords),
+        "head_shoulder": head_shoulder,
+        "shoulder_knee": shoulder_knee,
+        "left_arm": left_arm,
+        "right_arm": right_arm,
+        "prefilter": prefilter,
+        "basis": basis,
+        "projected": flat @ basis
+    }
+
+def _base_similarity(user_flat, ref_flat, uu, vv):
+    """코사인/유클리드 기반 기본 유사도를 원소별로 계산합니다. (배열 모양은 브로드캐스트 규칙을 따름)"""
+    uv = np.sum(user_flat * ref_flat, axis=-1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        cosine_dist = np.clip(1.0 - uv / np.sqrt(uu * vv), 0.0, 2.0)
+    cosine_sim = 1 - cosine_dist
+    diff = user_flat - ref_flat
+    euclidean_dist = np.sqrt(np.sum(diff * diff, axis=-1))
+    euclidean_sim = 1 / (1 + euclidean_dist)
+    return (cosine_sim + euclidean_sim) / 2
+
+def _feature_similarities(user_coords, reference_set):
+    """고관절 각도, 상대 위치, 팔 높이 유사도를 (F, P, V) 배열로 계산합니다."""
+    user_hip_angle = batch_hip_flexion_angle(user_coords)[:, None, None]
+    hip_angle_similarity = 1 / (1 + np.abs(user_hip_angle - reference_set["hip_angle"][None]) / 180)
+
+    user_head_shoulder, user_shoulder_knee = batch_relative_positions(user_coords)
+    rel_position_similarity = 1 / (1 + (
+        np.abs(user_head_shoulder[:, None, None] - reference_set["head_shoulder"][None]) +
+        np.abs(user_shoulder_knee[:, None, None] - reference_set["shoulder_knee"][None])
+    ) / 100)
+
+    user_left_arm, user_right_arm = batch_wrist_relative_height(user_coords)
+    arm_height_similarity = 1 / (1 + (
+        np.abs(user_left_arm[:, None, None] - reference_set["left_arm"][None]) +
+        np.abs(user_right_arm[:, None, None] - reference_set["right_arm"][None])
+    ) / 100)
+    return hip_angle_similarity, rel_position_similarity, arm_height_similarity
+
+def _combine_similarities(base_similarity, hip_angle_similarity, rel_position_similarity, arm_height_similarity, mask):
+    """항목별 유사도를 가중합하고, mask가 False인 자리는 0으로 채워 반환합니다."""
+    final_similarity = (
+        0.4 * base_similarity +
+        0.2 * hip_angle_similarity +
+        0.2 * rel_position_similarity +
+        0.2 * arm_height_similarity
+    )
+    comprehensive_similarities = {
+        'base_similarity': np.where(mask, base_similarity, 0),
+        'hip_angle_similarity': np.where(mask, hip_angle_similarity, 0),
+        'rel_position_similarity': np.where(mask, rel_position_similarity, 0),
+        'arm_height_similarity': np.where(mask, arm_height_similarity, 0)
+    }
+    return np.where(mask, final_similarity, 0), comprehensive_similarities
+
+def score_frames(user_coords, reference_set):
+    """여러 프레임의 정규화된 랜드마크를 모든 기준 포즈와 한 번에 비교합니다.
+
+    user_coords는 (F, 10, 3) 또는 (10, 3) 배열이며, calculate_comprehensive_similarity와
+    같은 값을 (F, P, V) 배열로 반환합니다. 유효하지 않은 변형 자리는 0입니다.
+    reference_set["prefilter"]가 켜져 있거나, None이면서 (프레임 수 × 기준 포즈 수)가 PREFILTER_MIN_COMPARISONS 이상이면
+    score_frames_prefiltered를 사용합니다.
+    """
+    user_coords = np.asarray(user_coords, dtype=np.float64)
+    if user_coords.ndim == 2:
+        user_coords = user_coords[None]
+    prefilter = reference_set["prefilter"]
+    if prefilter is None:
+        prefilter = len(user_coords) * int(reference_set["counts"].sum()) >= PREFILTER_MIN_COMPARISONS
+    if prefilter:
+        return score_frames_prefiltered(user_coords, reference_set)
+
+    user_flat = user_coords.reshape(len(user_coords), -1)
+    uu = np.sum(user_flat * user_flat, axis=-1)[:, None, None]
+    base_similarity = _base_similarity(
+        user_flat[:, None, None, :], reference_set["flat"][None], uu, reference_set["sq_norm"][None]
+    )
+    return _combine_similarities(
+        base_similarity, *_feature_similarities(user_coords, reference_set), reference_set["mask"][None]
+    )
+
+def score_frames_prefiltered(user_coords, reference_set):
+    """저차원 투영으로 후보를 거른 뒤 후보에 대해서만 전체 유사도를 계산합니다.
+
+    1단계: 투영 거리(실제 거리의 하한)로 기본 유사도의 상한을 구하고, 나머지 항목은 그대로 계산하여
+    기준 포즈별 최종 유사도 상한을 만듭니다.
+    2단계: 포즈마다 상한이 가장 큰 변형의 실제 유사도를 기준값으로 삼고, 상한이 기준값보다 낮은 변형은 제외합니다.
+    최고 유사도 변형은 반드시 후보에 남으므로 포즈별 최고값과 선택 결과는 score_frames와 같으며,
+    제외된 변형 자리는 0으로 채워집니다.
+    """
+    user_coords = np.asarray(user_coords, dtype=np.float64)
+    if user_coords.ndim == 2:
+        user_coords = user_coords[None]
+    mask = reference_set["mask"][None]
+    user_flat = user_coords.reshape(len(user_coords), -1)
+    uu = np.sum(user_flat * user_flat, axis=-1)[:, None, None]
+    vv = reference_set["sq_norm"][None]
+    features = _feature_similarities(user_coords, reference_set)
+
+    # 1단계: 기본 유사도 상한
+    projected_diff = (user_flat @ reference_set["basis"])[:, None, None, :] - reference_set["projected"][None]
+    distance_bound = np.sqrt(np.sum(projected_diff * projected_diff, axis=-1))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        cosine_bound = np.minimum(1.0, (uu + vv - distance_bound ** 2) / (2 * np.sqrt(uu * vv)))
+    base_bound = (np.nan_to_num(cosine_bound, nan=1.0) + 1 / (1 + distance_bound)) / 2
+    upper_bound = 0.4 * base_bound + 0.2 * (features[0] + features[1] + features[2]) + PREFILTER_TOLERANCE
+    upper_bound = np.where(mask, upper_bound, -np.inf)
+
+    # 2단계: 포즈별 기준값 계산 후 후보만 전체 계산
+    seed = np.argmax(upper_bound, axis=-1)
+    f_idx, p_idx = np.indices(seed.shape)
+    candidates = np.zeros(upper_bound.shape, dtype=bool)
+    candidates[f_idx, p_idx, seed] = True
+    seed_base = _base_similarity(user_flat[f_idx], reference_set["flat"][p_idx, seed], uu[:, :, 0], vv[0][p_idx, seed])
+    seed_final = (
+        0.4 * seed_base +
+        0.2 * features[0][f_idx, p_idx, seed] +
+        0.2 * features[1][f_idx, p_idx, seed] +
+        0.2 * features[2][f_idx, p_idx, seed]
+    )
+    candidates |= upper_bound >= seed_final[..., None]
+
+    f_c, p_c, v_c = np.nonzero(candidates)
+    base_similarity = np.zeros(upper_bound.shape)
+    base_similarity[f_c, p_c, v_c] = _base_similarity(
+        user_flat[f_c], reference_set["flat"][p_c, v_c], uu[f_c, 0, 0], vv[0, p_c, v_c]
+    )
+    return _combine_similarities(base_similarity, *features, mask & candidates)
+
+def select_best_matches(final_similarity, comprehensive_similarities, reference_set, frame=0):
+    """score_frames 결과에서 한 프레임의 포즈별 최고 유사도를 process_pose와 같은 형태로 반환합니다."""
+    results = []
+    for p, idx in enumerate(reference_set["pose_ids"]):
+        count = int(reference_set["counts"][p])
+        if count == 0:
+            results.append((idx, [], 0, 0, {}, None))
+            continue
+        similarities = final_similarity[frame, p, :count].tolist()
+        max_index = int(np.argmax(final_similarity[frame, p, :count]))
+        max_similarity = similarities[max_index]
+        comprehensive_similarity = {
+            key: float(values[frame, p, max_index])
+            for key, values in comprehensive_similarities.items()
+        }
+        best_standard_coords = reference_set["standard_poses"][idx][max_index]
+        results.append((idx, similarities, max_similarity, max_similarity, comprehensive_similarity, best_standard_coords))
+    return results
+
 def process_pose(args):
-    """포즈별로 유사도 계산을 병렬 처리하기 위한 함수."""
+    """한 포즈의 모든 변형과 유사도를 계산합니다. (score_frames의 스칼라 기준 구현)"""
     idx, user_coords, standard_coords_list, similarity_threshold, consecutive_required = args
     similarities = []
     comprehensive_similarities = []
@@ -319,103 +1084,784 @@ def analyze_arm_height(user_coords, standard_coords):
 
     return " ".join(feedback) if feedback else "팔 높이가 적절합니다."
 
-def analyze_user_video(video_file, user_id):
-    """사용자 동영상을 분석하여 피드백을 제공합니다."""
-    standard_poses = load_standard_poses()
-    if not standard_poses:
-        logging.error("기준 포즈를 로드할 수 없습니다.")
-        sys.exit(1)
+class FrameSampler:
+    """분석할 다음 프레임까지의 간격을 결정합니다.
 
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    save_folder = os.path.join(USER_POSE_DATA_FOLDER, f"{user_id}_{timestamp}")
-    os.makedirs(save_folder, exist_ok=True)
+    - all: 모든 프레임
+    - stride: stride 프레임마다 하나
+    - fps: 초당 target_fps 프레임
+    - adaptive: 평소에는 target_fps로, 랜드마크나 유사도가 빠르게 변할 때는 모든 프레임을 분석
+    """
 
-    cap = cv2.VideoCapture(video_file)
-    if not cap.isOpened():
-        logging.error("동영상을 열 수 없습니다.")
-        sys.exit(1)
+    def __init__(self, mode='all', fps=DEFAULT_VIDEO_FPS, stride=1, target_fps=None):
+        if mode not in SAMPLING_MODES:
+            raise ValueError(f"지원하지 않는 샘플링 모드입니다: {mode}")
+        self.mode = mode
+        if mode == 'all':
+            self.base_step = 1
+        elif mode == 'stride':
+            self.base_step = max(1, int(stride))
+        else:
+            target_fps = target_fps or DEFAULT_TARGET_FPS
+            self.base_step = max(1, int(round(fps / target_fps)))
+        self.last_step = self.base_step
+        self.previous_coords = None
+        self.previous_scores = None
+
+    def next_step(self, coords=None, scores=None):
+        """방금 분석한 프레임의 정규화 랜드마크와 포즈별 최고 유사도를 받아 다음 간격을 반환합니다.
+
+        유사도를 계산하지 않는 경우(scores=None)에는 랜드마크 움직임만으로 판단합니다.
+        """
+        step = self.base_step
+        if self.mode == 'adaptive':
+            if coords is None:
+                self.previous_coords = None
+                self.previous_scores = None
+            else:
+                if self.previous_coords is not None:
+                    motion = np.mean(np.linalg.norm(coords - self.previous_coords, axis=1)) / self.last_step
+                    score_change = 0.0 if scores is None or self.previous_scores is None else \
+                        np.max(np.abs(scores - self.previous_scores)) / self.last_step
+                    if motion > ADAPTIVE_MOTION_THRESHOLD or score_change > ADAPTIVE_SIMILARITY_THRESHOLD:
+                        step = 1
+                self.previous_coords = coords
+                self.previous_scores = scores
+        self.last_step = step
+        return step
 
-    frame_count = 0
+def skip_frames(cap, count):
+    """디코딩 결과를 변환하지 않고 count개의 프레임을 건너뜁니다. 영상이 끝나면 False를 반환합니다."""
+    for _ in range(count):
+        if not cap.grab():
+            return False
+    return True
+
+def create_pose_tracking_state(pose_ids):
+    """포즈별 최고 유사도 프레임과 유지 시간을 추적할 상태를 생성합니다."""
     pose_similarities = {
         idx: {
             "similarity_sum": 0,
             "average_similarity": 0,
-            "frame": None,
+            "frame_index": None,
             "max_similarity_sum": 0,
-            "max_frame": None,
+            "max_frame_index": None,
             "individual_similarities": [],
             "comprehensive_similarities": {},
             "user_coords": None,
             "best_standard_coords": None,
             "user_coords_max": None,
             "best_standard_coords_max": None
-        } for idx in standard_poses.keys()
+        } for idx in pose_ids
     }
-    pose_consecutive_counts = {idx: 0 for idx in standard_poses.keys()}
+    # 기준 이상 유사도가 유지된 시간 (원본 영상의 프레임 수 단위)
+    pose_held_frames = {idx: 0 for idx in pose_ids}
+    return pose_similarities, pose_held_frames
+
+def update_pose_tracking_state(pose_similarities, pose_held_frames, results, frame_index, normalized_landmarks, step):
+    """한 프레임의 포즈별 매칭 결과로 추적 상태를 갱신합니다. step은 직전 분석 프레임과의 간격입니다.
+
+    프레임 이미지는 보관하지 않고 프레임 번호만 기록하며, 결과 이미지는 분석 후 fetch_frames로 다시 읽습니다.
+    """
+    for result in results:
+        idx, similarities, average_similarity, max_similarity, comprehensive_similarity, best_standard_coords = result
+        pose_similarities[idx]["individual_similarities"] = similarities
+        pose_similarities[idx]["comprehensive_similarities"] = comprehensive_similarity
+
+        if max_similarity > pose_similarities[idx]["max_similarity_sum"]:
+            pose_similarities[idx]["max_similarity_sum"] = max_similarity
+            pose_similarities[idx]["max_frame_index"] = frame_index
+            pose_similarities[idx]["user_coords_max"] = normalized_landmarks
+            pose_similarities[idx]["best_standard_coords_max"] = best_standard_coords
+
+        if average_similarity >= SIMILARITY_THRESHOLD:
+            # 연속 구간의 첫 샘플은 1프레임, 이후 샘플은 직전 샘플과의 간격만큼 유지된 것으로 봅니다.
+            held = pose_held_frames[idx]
+            pose_held_frames[idx] = 1 if held == 0 else held + step
+            if pose_held_frames[idx] >= CONSECUTIVE_REQUIRED:
+                if max_similarity > pose_similarities[idx]["similarity_sum"]:
+                    pose_similarities[idx]["similarity_sum"] = max_similarity
+                    pose_similarities[idx]["average_similarity"] = average_similarity
+                    pose_similarities[idx]["frame_index"] = frame_index
+                    pose_similarities[idx]["user_coords"] = normalized_landmarks
+                    pose_similarities[idx]["best_standard_coords"] = best_standard_coords
+        else:
+            pose_held_frames[idx] = 0
+
+def best_pose_scores(final_similarity, reference_set, frame=0):
+    """score_frames 결과에서 한 프레임의 포즈별 최고 유사도 배열을 반환합니다."""
+    return np.where(reference_set["mask"], final_similarity[frame], -np.inf).max(axis=-1)
+
+def _range_argmax(values, lo, hi):
+    """values[lo[i]:hi[i] + 1] 구간의 최댓값 위치를 희소 테이블로 한 번에 구합니다. lo > hi인 구간은 -1입니다."""
+    n = len(values)
+    levels = max(1, int(np.log2(max(n, 1))) + 1)
+    table = np.tile(np.arange(n), (levels, 1))
+    for level in range(1, levels):
+        half = 1 << (level - 1)
+        left = table[level - 1, :n - half]
+        right = table[level - 1, half:]
+        table[level, :n - half] = np.where(values[right] > values[left], right, left)
+    valid = lo <= hi
+    length = np.where(valid, hi - lo + 1, 1)
+    level = np.floor(np.log2(length)).astype(int)
+    left = table[level, np.where(valid, lo, 0)]
+    right = table[level, np.where(valid, hi - (1 << level) + 1, 0)]
+    best = np.where(values[right] > values[left], right, left)
+    return np.where(valid, best, -1)
+
+def _align_ordered_poses(frame_indices, value, max_gap):
+    """value[f, k]의 합이 최대가 되도록 포즈 순서대로 f_1 < f_2 < ... 위치를 고르는 동적 계획법입니다.
+
+    이웃한 포즈의 프레임 번호 간격은 max_gap 이하로 제한(밴드)하며, 포즈마다 구간 최댓값 질의로 O(F log F)에 계산합니다.
+    (포즈 수, F) 누적 점수와 역추적 표를 반환합니다.
+    """
+    frame_count, pose_count = value.shape
+    lo = np.searchsorted(frame_indices, frame_indices - max_gap, side='left')
+    hi = np.arange(frame_count) - 1
+    score = np.full((pose_count, frame_count), -np.inf)
+    back = np.full((pose_count, frame_count), -1)
+    score[0] = value[:, 0]
+    for k in range(1, pose_count):
+        previous = _range_argmax(score[k - 1], lo, hi)
+        reachable = previous >= 0
+        score[k] = np.where(reachable, value[:, k] + score[k - 1][np.maximum(previous, 0)], -np.inf)
+        back[k] = previous
+    return score, back
+
+def _backtrack(score, back):
+    """_align_ordered_poses 결과에서 최적 경로(포즈별 위치 목록)를 복원합니다. 경로가 없으면 None입니다."""
+    position = int(np.argmax(score[-1]))
+    if not np.isfinite(score[-1, position]):
+        return None
+    path = [position]
+    for k in range(len(score) - 1, 0, -1):
+        position = int(back[k, position])
+        path.append(position)
+    return path[::-1]
+
+def match_sequence(frame_indices, user_coords, reference_set, max_gap, chunk_size=SEQUENCE_CHUNK_FRAMES):
+    """정규화된 랜드마크 시퀀스를 순서가 있는 기준 포즈(pose_ids 순서)에 한 번에 정렬합니다.
+
+    포즈별 프레임이 순서대로 증가하고 이웃한 포즈 간격이 max_gap 프레임 이하라는 조건에서
+    포즈별 최고 유사도의 합이 가장 큰 배정을 찾습니다. (밴드 제약이 있는 DTW)
+    유사도는 메모리 사용량을 제한하기 위해 chunk_size 프레임씩 score_frames로 모두 계산합니다.
+    LB_Keogh 포락선 상한으로 블록을 건너뛰는 방식은 480프레임 트랙에서 블록 크기 16일 때 블록의 100%,
+    4일 때 71%, 1일 때 1%를 계산했지만, 상한 계산 비용 때문에 어느 크기에서도 모두 계산하는 경우(5ms)보다 느려
+    (각각 9ms, 17ms, 32ms) 사용하지 않습니다.
+    (포즈별 위치 목록 또는 None, final_similarity, comprehensive_similarities)를 반환합니다.
+    """
+    frame_indices = np.asarray(frame_indices)
+    user_coords = np.asarray(user_coords, dtype=np.float64)
+    frame_count = len(user_coords)
+    mask = reference_set["mask"]
+    final_similarity = np.zeros((frame_count,) + mask.shape)
+    comprehensive_similarities = {
+        key: np.zeros((frame_count,) + mask.shape)
+        for key in ('base_similarity', 'hip_angle_similarity', 'rel_position_similarity', 'arm_height_similarity')
+    }
+    if frame_count < len(reference_set["pose_ids"]):
+        return None, final_similarity, comprehensive_similarities
+
+    for start in range(0, frame_count, chunk_size):
+        rows = slice(start, start + chunk_size)
+        final_similarity[rows], chunk_comprehensive = score_frames(user_coords[rows], reference_set)
+        for key, values in chunk_comprehensive.items():
+            comprehensive_similarities[key][rows] = values
+
+    # 변형이 없는 포즈는 어느 프레임에 배정해도 0점입니다.
+    empty = ~mask.any(axis=-1)
+    value = np.where(empty, 0.0, np.where(mask[None], final_similarity, -np.inf).max(axis=-1))
+    score, back = _align_ordered_poses(frame_indices, value, max_gap)
+    return _backtrack(score, back), final_similarity, comprehensive_similarities
 
-    similarity_threshold = 0.8
-    consecutive_required = 3
+def sequence_tracking_state(track, reference_set, fps):
+    """랜드마크 트랙 전체를 match_sequence로 정렬하여 create_pose_tracking_state와 같은 형태의 결과를 만듭니다.
 
-    pool = Pool(processes=min(cpu_count(), 6))
+    summarize_pose_results 등 프레임 단위 매칭의 결과 처리 함수를 그대로 사용할 수 있습니다.
+    """
+    pose_similarities, _ = create_pose_tracking_state(reference_set["pose_ids"])
+    detected = [(frame_index, landmarks) for frame_index, landmarks in track if landmarks is not None]
+    if not detected:
+        return pose_similarities
+    frame_indices = np.array([frame_index for frame_index, _ in detected])
+    user_coords = np.array([normalize_pose(landmarks) for _, landmarks in detected])
+    max_gap = max(1, int(round(SEQUENCE_MAX_GAP_SECONDS * fps)))
+    path, final_similarity, comprehensive_similarities = match_sequence(
+        frame_indices, user_coords, reference_set, max_gap
+    )
+    if path is None:
+        return pose_similarities
 
+    for p, position in enumerate(path):
+        idx, similarities, average_similarity, max_similarity, comprehensive_similarity, best_standard_coords = \
+            select_best_matches(final_similarity, comprehensive_similarities, reference_set, frame=position)[p]
+        state = pose_similarities[idx]
+        state.update({
+            "similarity_sum": max_similarity,
+            "average_similarity": average_similarity,
+            "frame_index": int(frame_indices[position]),
+            "max_similarity_sum": max_similarity,
+            "max_frame_index": int(frame_indices[position]),
+            "individual_similarities": similarities,
+            "comprehensive_similarities": comprehensive_similarity,
+            "user_coords": user_coords[position],
+            "best_standard_coords": best_standard_coords,
+            "user_coords_max": user_coords[position],
+            "best_standard_coords_max": best_standard_coords
+        })
+    return pose_similarities
+
+def record_stage(timings, stage, start):
+    """start(perf_counter 값)부터 지금까지 걸린 시간을 timings와 단계별 지연 시간 히스토그램에 기록합니다."""
+    elapsed = time.perf_counter() - start
+    timings[stage] += elapsed
+    metrics.observe("stage_seconds", elapsed, stage=stage)
+
+def record_frames(timings, key, count=1):
+    """프레임 수를 timings와 같은 이름의 카운터에 더합니다."""
+    timings[key] += count
+    metrics.inc(key, count)
+
+def current_best_similarities(pose_similarities, standard_poses):
+    """포즈별 현재까지의 최고 평균 유사도를 반환합니다. 유지 조건을 만족한 결과가 없으면 최고 순간 유사도를 사용합니다."""
+    best = {}
+    for idx, data in pose_similarities.items():
+        if data["frame_index"] is not None:
+            best[idx] = float(data["average_similarity"])
+        elif data["max_frame_index"] is not None and len(standard_poses[idx]) > 0:
+            best[idx] = float(data["max_similarity_sum"] / len(standard_poses[idx]))
+        else:
+            best[idx] = 0.0
+    return best
+
+def poses_settled(pose_similarities, frame_index, similarity=EARLY_STOP_SIMILARITY, patience=EARLY_STOP_PATIENCE):
+    """모든 포즈가 유지 조건을 만족한 높은 유사도 결과를 가지고, patience 프레임 동안 더 나아지지 않았는지 확인합니다."""
+    return all(
+        data["frame_index"] is not None
+        and data["average_similarity"] >= similarity
+        and frame_index - data["frame_index"] >= patience
+        for data in pose_similarities.values()
+    )
+
+def run_serial_scan(cap, sampler, estimator, reference_set, pose_similarities, pose_held_frames, timings, track=None,
+                    roi=None, on_frame=None, start_frame=0, end_frame=None):
+    """디코딩, 추론, 유사도 계산, 상태 갱신을 한 스레드에서 순서대로 수행합니다.
+
+    track에 list를 넘기면 분석한 프레임마다 (프레임 번호, 원본 랜드마크 또는 None)을 추가합니다.
+    reference_set이 None이면 유사도 계산과 상태 갱신 없이 track만 기록합니다.
+    on_frame은 분석한 프레임의 상태 갱신 후 프레임 번호와 함께 호출되며, True를 반환하면 분석을 중단합니다.
+    cap이 start_frame 위치에 있으면 그 프레임부터 end_frame 직전까지만 분석합니다. (run_sharded_scan 참고)
+    """
+    for stage in PIPELINE_STAGES:
+        timings[stage] = 0.0
+    timings["frames_decoded"] = 0
+    timings["frames_analyzed"] = 0
+    timings["frames_detected"] = 0
+    wall_start = time.perf_counter()
+
+    frame_index = start_frame - 1
+    step = 1
     try:
         while cap.isOpened():
+            if end_frame is not None and frame_index + step >= end_frame:
+                break
+            start = time.perf_counter()
+            if not skip_frames(cap, step - 1):
+                break
             ret, frame = cap.read()
+            record_stage(timings, "decode", start)
             if not ret:
                 break
-            frame_count += 1
+            frame_index += step
+            record_frames(timings, "frames_decoded", step)
+            record_frames(timings, "frames_analyzed")
 
-            landmarks = extract_landmarks_from_image(frame)
+            start = time.perf_counter()
+            landmarks = extract_landmarks_from_image(frame, estimator, roi)
+            record_stage(timings, "inference", start)
+            if track is not None:
+                track.append((frame_index, landmarks))
+            normalized_landmarks = None
+            best_scores = None
             if landmarks is not None:
+                timings["frames_detected"] += 1
+                start = time.perf_counter()
                 normalized_landmarks = normalize_pose(landmarks)
-                tasks = []
-                for idx, standard_coords_list in standard_poses.items():
-                    tasks.append((idx, normalized_landmarks, standard_coords_list, similarity_threshold, consecutive_required))
-                results = pool.map(process_pose, tasks)
-
-                for result in results:
-                    idx, similarities, average_similarity, max_similarity, comprehensive_similarity, best_standard_coords = result
-                    pose_similarities[idx]["individual_similarities"] = similarities
-                    pose_similarities[idx]["comprehensive_similarities"] = comprehensive_similarity
-
-                    if max_similarity > pose_similarities[idx]["max_similarity_sum"]:
-                        pose_similarities[idx]["max_similarity_sum"] = max_similarity
-                        pose_similarities[idx]["max_frame"] = frame.copy()
-                        pose_similarities[idx]["user_coords_max"] = normalized_landmarks
-                        pose_similarities[idx]["best_standard_coords_max"] = best_standard_coords
-
-                    if average_similarity >= similarity_threshold:
-                        pose_consecutive_counts[idx] += 1
-                        if pose_consecutive_counts[idx] >= consecutive_required:
-                            if max_similarity > pose_similarities[idx]["similarity_sum"]:
-                                pose_similarities[idx]["similarity_sum"] = max_similarity
-                                pose_similarities[idx]["average_similarity"] = average_similarity
-                                pose_similarities[idx]["frame"] = frame.copy()
-                                pose_similarities[idx]["user_coords"] = normalized_landmarks
-                                pose_similarities[idx]["best_standard_coords"] = best_standard_coords
-                    else:
-                        pose_consecutive_counts[idx] = 0
+                if reference_set is not None:
+                    final_similarity, comprehensive_similarities = score_frames(normalized_landmarks, reference_set)
+                    best_scores = best_pose_scores(final_similarity, reference_set)
+                record_stage(timings, "scoring", start)
+
+            if best_scores is not None:
+                start = time.perf_counter()
+                results = select_best_matches(final_similarity, comprehensive_similarities, reference_set)
+                update_pose_tracking_state(pose_similarities, pose_held_frames, results, frame_index, normalized_landmarks, step)
+                record_stage(timings, "aggregation", start)
+
+            if on_frame is not None and on_frame(frame_index):
+                break
+            step = sampler.next_step(normalized_landmarks, best_scores)
+    finally:
+        timings["wall"] = time.perf_counter() - wall_start
+
+def _put_until_stopped(target_queue, item, stop_event):
+    """큐에 여유가 생길 때까지 기다렸다가 넣습니다. 중단 요청이 오면 False를 반환합니다."""
+    while not stop_event.is_set():
+        try:
+            target_queue.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+def _get_until_stopped(source_queue, stop_event):
+    """큐에서 항목을 꺼냅니다. 중단 요청이 오면 _PIPELINE_END를 반환합니다."""
+    while not stop_event.is_set():
+        try:
+            return source_queue.get(timeout=0.1)
+        except queue.Empty:
+            continue
+    return _PIPELINE_END
+
+def _decode_stage(cap, sampler, out_queue, stop_event, timings, errors):
+    """디코딩 스레드: 고정 간격 모드는 필요한 프레임만, 적응형 모드는 모든 프레임을 디코딩합니다."""
+    step = 1 if sampler.mode == 'adaptive' else sampler.base_step
+    frame_index = -1
+    gap = 1
+    try:
+        while cap.isOpened() and not stop_event.is_set():
+            start = time.perf_counter()
+            if not skip_frames(cap, gap - 1):
+                break
+            ret, frame = cap.read()
+            record_stage(timings, "decode", start)
+            if not ret:
+                break
+            frame_index += gap
+            record_frames(timings, "frames_decoded", gap)
+            gap = step
+            if not _put_until_stopped(out_queue, (frame_index, frame), stop_event):
+                break
     except Exception as e:
-        logging.error(f"영상 분석 중 오류 발생: {e}")
+        errors.append(e)
+    finally:
+        _put_until_stopped(out_queue, _PIPELINE_END, stop_event)
+
+def _inference_stage(in_queue, out_queue, sampler, estimator, reference_set, stop_event, timings, errors, roi=None):
+    """추론 스레드: 샘플링 간격에 맞는 프레임만 Mediapipe로 처리하고 유사도를 계산합니다."""
+    last_index = -1
+    step = 1
+    try:
+        while True:
+            item = _get_until_stopped(in_queue, stop_event)
+            if item is _PIPELINE_END:
+                break
+            frame_index, frame = item
+            gap = frame_index - last_index
+            if gap < step:
+                continue
+            last_index = frame_index
+            record_frames(timings, "frames_analyzed")
+
+            start = time.perf_counter()
+            landmarks = extract_landmarks_from_image(frame, estimator, roi)
+            record_stage(timings, "inference", start)
+            normalized_landmarks = None
+            scores = None
+            best_scores = None
+            if landmarks is not None:
+                timings["frames_detected"] += 1
+                start = time.perf_counter()
+                normalized_landmarks = normalize_pose(landmarks)
+                if reference_set is not None:
+                    scores = score_frames(normalized_landmarks, reference_set)
+                    best_scores = best_pose_scores(scores[0], reference_set)
+                record_stage(timings, "scoring", start)
+            step = sampler.next_step(normalized_landmarks, best_scores)
+
+            if not _put_until_stopped(out_queue, (frame_index, gap, landmarks, normalized_landmarks, scores), stop_event):
+                break
+    except Exception as e:
+        errors.append(e)
+    finally:
+        _put_until_stopped(out_queue, _PIPELINE_END, stop_event)
+
+def run_pipelined_scan(cap, sampler, estimator, reference_set, pose_similarities, pose_held_frames, timings,
+                       track=None, roi=None, on_frame=None, queue_size=PIPELINE_QUEUE_SIZE):
+    """디코딩/추론 스레드와 집계(현재 스레드)를 크기 제한 큐로 연결하여 동시에 수행합니다.
+
+    각 큐는 생산자와 소비자가 하나뿐인 FIFO이므로 결과는 프레임 순서대로 집계되며,
+    큐가 가득 차면 앞 단계가 기다리므로 메모리에 쌓이는 프레임 수는 queue_size로 제한됩니다.
+    reference_set이 None이면 run_serial_scan과 같이 track만 기록합니다.
+    on_frame이 True를 반환하면 중단 신호를 보내 디코딩/추론 스레드도 멈춥니다.
+    """
+    for stage in PIPELINE_STAGES:
+        timings[stage] = 0.0
+    timings["frames_decoded"] = 0
+    timings["frames_analyzed"] = 0
+    timings["frames_detected"] = 0
+    wall_start = time.perf_counter()
+
+    decoded_queue = queue.Queue(maxsize=queue_size)
+    inferred_queue = queue.Queue(maxsize=queue_size)
+    stop_event = threading.Event()
+    errors = []
+    threads = [
+        threading.Thread(target=_decode_stage,
+                         args=(cap, sampler, decoded_queue, stop_event, timings, errors), daemon=True),
+        threading.Thread(target=_inference_stage,
+                         args=(decoded_queue, inferred_queue, sampler, estimator, reference_set,
+                               stop_event, timings, errors, roi), daemon=True)
+    ]
+    for thread in threads:
+        thread.start()
+
+    try:
+        while True:
+            item = _get_until_stopped(inferred_queue, stop_event)
+            if item is _PIPELINE_END:
+                break
+            frame_index, gap, landmarks, normalized_landmarks, scores = item
+            if track is not None:
+                track.append((frame_index, landmarks))
+            if scores is not None:
+                start = time.perf_counter()
+                final_similarity, comprehensive_similarities = scores
+                results = select_best_matches(final_similarity, comprehensive_similarities, reference_set)
+                update_pose_tracking_state(pose_similarities, pose_held_frames, results, frame_index, normalized_landmarks, gap)
+                record_stage(timings, "aggregation", start)
+            if on_frame is not None and on_frame(frame_index):
+                break
+    finally:
+        stop_event.set()
+        for thread in threads:
+            thread.join()
+        timings["wall"] = time.perf_counter() - wall_start
+    if errors:
+        raise errors[0]
+
+def _analyze_segment(job):
+    """분할 분석 워커: 영상의 [start, end) 구간을 자체 VideoCapture와 Pose 인스턴스로 분석합니다.
+
+    start 앞 warmup 프레임은 추론만 하여 추적 상태를 준비하고 결과에서는 제외합니다.
+    (구간 트랙, 단계별 처리 시간)을 반환합니다.
+    """
+    import cv2
+    video_file, start, end, warmup, standard_poses, sampler_options, roi_size, model_complexity = job
+    reference_set = prepare_reference_set(standard_poses)
+    sampler = FrameSampler(**sampler_options)
+    estimator = get_default_estimator(model_complexity)
+    estimator.reset()
+    roi = RoiTracker(roi_size) if roi_size else None
+    timings = {}
+    track = []
+
+    cap = cv2.VideoCapture(video_file)
+    if not cap.isOpened():
+        raise PoseAnalysisError(f"동영상을 열 수 없습니다: {video_file}")
+    try:
+        # 워밍업 구간은 분석 간격에 맞춰 추론합니다.
+        warm_start = max(0, start - warmup)
+        warm_start -= (start - warm_start) % sampler.base_step
+        cap.set(cv2.CAP_PROP_POS_FRAMES, warm_start)
+        if int(cap.get(cv2.CAP_PROP_POS_FRAMES)) != warm_start:
+            logging.warning(f"프레임 탐색 위치가 맞지 않아 처음부터 읽습니다: {warm_start}")
+            cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            if not skip_frames(cap, warm_start):
+                return track, timings
+        for offset in range(start - warm_start):
+            ret, frame = cap.read()
+            if not ret:
+                return track, timings
+            if offset % sampler.base_step == 0:
+                extract_landmarks_from_image(frame, estimator, roi)
+        pose_similarities, pose_held_frames = create_pose_tracking_state(standard_poses.keys())
+        # 추적 상태는 부모 프로세스가 트랙을 이어 붙여 다시 계산하므로, 적응형 샘플링이 아니면 유사도를 계산하지 않습니다.
+        scan_reference_set = reference_set if sampler.mode == 'adaptive' else None
+        run_serial_scan(cap, sampler, estimator, scan_reference_set, pose_similarities, pose_held_frames, timings, track,
+                        roi, start_frame=start, end_frame=end)
     finally:
         cap.release()
-        pool.close()
-        pool.join()
+    if roi is not None:
+        timings["roi_frames"] = roi.roi_frames
+        timings["full_frame_searches"] = roi.full_frame_searches
+    return track, timings
 
-    # 결과 준비
-    comments = {}
+def _init_shard_worker():
+    """분할 분석 워커 프로세스의 로깅을 설정합니다. Pose 인스턴스는 첫 구간에서 만들어 재사용합니다."""
+    configure_logging()
+
+def run_sharded_scan(video_file, frame_count, fps, shards, standard_poses, reference_set, pose_similarities,
+                     pose_held_frames, timings, track=None, sampler_options=None, roi_size=None, on_segment=None,
+                     model_complexity=DEFAULT_MODEL_COMPLEXITY):
+    """긴 영상을 시간 구간으로 나누어 여러 프로세스에서 동시에 추론합니다.
+
+    각 구간은 앞 구간과 SHARD_WARMUP_SECONDS만큼 겹쳐 읽어 추적 상태를 준비한 뒤 자기 구간만 분석합니다.
+    구간 경계에서 연속 유지 조건과 포즈별 최고 유사도가 끊기지 않도록,
+    모든 구간의 트랙을 프레임 순서대로 이어 붙여 replay_track으로 상태를 한 번에 갱신합니다.
+    on_segment는 구간이 끝날 때마다 (끝난 구간 수, 전체 구간 수, 분석한 프레임 수)와 함께 호출됩니다.
+    reference_set이 None이면 상태를 갱신하지 않고 track만 채웁니다.
+
+    구간 수는 CPU 코어 수를 넘지 않습니다. CAP_PROP_FRAME_COUNT는 추정값이므로 마지막 구간은 영상 끝까지 읽습니다.
+    Mediapipe 추적 결과는 이전 프레임에 따라 달라지므로, 워밍업을 거쳐도 구간 경계 직후의 랜드마크와
+    그로부터 고른 포즈별 프레임/유사도는 나누지 않고 분석한 결과와 다를 수 있습니다.
+    """
+    sampler_options = sampler_options or {"mode": "all", "fps": fps}
+    base_step = FrameSampler(**sampler_options).base_step
+    shards = max(1, min(shards, cpu_count(), int(frame_count // max(1, SHARD_MIN_SECONDS * fps))))
+    # 구간 시작을 분석 간격의 배수로 맞춰 나누지 않은 경우와 같은 프레임을 분석하게 합니다.
+    length = -(-frame_count // shards)
+    length += -length % base_step
+    bounds = [(start, start + length) for start in range(0, frame_count, length)]
+    bounds[-1] = (bounds[-1][0], None)
+    warmup = int(round(SHARD_WARMUP_SECONDS * fps))
+    jobs = [
+        (video_file, start, end, warmup, standard_poses, sampler_options, roi_size, model_complexity)
+        for start, end in bounds
+    ]
+
+    wall_start = time.perf_counter()
+    segments = {}
+    # 프로세스별 Mediapipe 그래프 스레드를 물려받지 않도록 spawn을 사용합니다.
+    context = multiprocessing.get_context('spawn')
+    with context.Pool(processes=len(jobs), initializer=_init_shard_worker) as shard_pool:
+        for done, (segment_track, segment_timings) in enumerate(shard_pool.imap_unordered(_analyze_segment, jobs), 1):
+            if segment_track:
+                segments[segment_track[0][0]] = segment_track
+            for key, value in segment_timings.items():
+                if key != "wall":
+                    timings[key] = timings.get(key, 0) + value
+            if on_segment is not None:
+                on_segment(done, len(jobs), timings.get("frames_analyzed", 0))
+
+    merged = [item for first_index in sorted(segments) for item in segments[first_index]]
+    if track is not None:
+        track.extend(merged)
+    if reference_set is not None:
+        start = time.perf_counter()
+        replay_track(merged, reference_set, pose_similarities, pose_held_frames)
+        timings["aggregation"] = timings.get("aggregation", 0.0) + time.perf_counter() - start
+    timings["shards"] = len(jobs)
+    timings["wall"] = time.perf_counter() - wall_start
+
+def load_throughput_profile(path=THROUGHPUT_PROFILE_PATH):
+    """이 호스트에서 측정한 {모델 복잡도: {"frame_seconds", "decode_seconds"}}를 읽습니다. 없으면 빈 dict입니다."""
+    try:
+        with open(path, encoding='utf-8') as f:
+            profile = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if profile.get("host") != platform.node():
+        return {}
+    return {int(complexity): values for complexity, values in profile.get("models", {}).items()}
+
+@contextlib.contextmanager
+def file_lock(path):
+    """path.lock 파일에 배타적 잠금을 걸어 여러 프로세스의 읽기-수정-쓰기가 겹치지 않게 합니다.
+
+    fcntl이 없는 환경(Windows)에서는 잠그지 않습니다.
+    """
+    try:
+        import fcntl
+    except ImportError:
+        yield
+        return
+    with open(f"{path}.lock", 'a') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+def record_throughput(model_complexity, frame_seconds, decode_seconds=None, path=THROUGHPUT_PROFILE_PATH):
+    """분석 프레임당/디코딩 프레임당 처리 시간 측정값을 처리량 프로필에 지수 이동 평균으로 반영합니다.
+
+    배치/분할 워커가 동시에 기록해도 측정값을 잃지 않도록 잠근 상태에서 읽고 씁니다.
+    """
+    try:
+        with file_lock(path):
+            profile = load_throughput_profile(path)
+            values = profile.setdefault(model_complexity, {})
+            for key, measured in (("frame_seconds", frame_seconds), ("decode_seconds", decode_seconds)):
+                if measured is None:
+                    continue
+                previous = values.get(key)
+                values[key] = measured if previous is None else previous + THROUGHPUT_SMOOTHING * (measured - previous)
+            write_json_atomic(path, {
+                "host": platform.node(),
+                "models": {str(complexity): model_values for complexity, model_values in profile.items()}
+            })
+    except OSError as e:
+        logging.warning(f"처리량 프로필 저장 실패: {e}")
+
+def plan_analysis(frame_count, fps, tier=None, budget=None, profile=None, pose_count=6):
+    """품질 등급 또는 시간 예산(초)에 맞춰 모델 복잡도와 초당 분석 프레임 수를 정합니다.
+
+    tier를 지정하면 그 등급을 사용합니다. budget을 함께 지정하면 tier(없으면 accurate)부터 정확도 순으로
+    측정된 처리량으로 예상 시간이 예산 안에 드는 첫 등급을 고르고, fast로도 넘치면 초당 분석 프레임 수를
+    MIN_TARGET_FPS까지 낮춥니다. 사용할 수 없는 모델 복잡도는 기본 모델로 대신합니다.
+    {"tier", "model_complexity", "target_fps", "escalate", "estimated_seconds"}를 반환합니다.
+    """
+    if tier is not None and tier not in QUALITY_TIERS:
+        raise PoseAnalysisError(f"지원하지 않는 품질 등급입니다: {tier}")
+    if profile is None:
+        profile = load_throughput_profile()
+
+    def frame_seconds(complexity):
+        return profile.get(complexity, {}).get("frame_seconds", DEFAULT_FRAME_SECONDS[complexity])
+
+    decode_seconds = profile.get(DEFAULT_MODEL_COMPLEXITY, {}).get("decode_seconds", DEFAULT_DECODE_SECONDS)
+
+    def build(name, target_fps=None):
+        settings = TIER_SETTINGS[name]
+        complexity = settings["model_complexity"]
+        if complexity != DEFAULT_MODEL_COMPLEXITY and not model_available(complexity):
+            complexity = DEFAULT_MODEL_COMPLEXITY
+        target_fps = target_fps or settings["target_fps"]
+        escalate = settings["escalate"] and model_available(ESCALATION_MODEL_COMPLEXITY)
+        plan = {"tier": name, "model_complexity": complexity, "target_fps": target_fps, "escalate": escalate,
+                "estimated_seconds": None}
+        if frame_count:
+            analyzed = frame_count if target_fps is None else frame_count * min(1.0, target_fps / fps)
+            estimate = analyzed * frame_seconds(complexity) + frame_count * decode_seconds
+            if escalate:
+                window = 2 * int(round(ESCALATION_WINDOW_SECONDS * fps)) + 1
+                estimate += pose_count * window * frame_seconds(ESCALATION_MODEL_COMPLEXITY)
+            plan["estimated_seconds"] = estimate
+        return plan
+
+    candidates = QUALITY_TIERS[QUALITY_TIERS.index(tier or QUALITY_TIERS[0]):]
+    if budget is None or not frame_count:
+        return build(candidates[0])
+    for name in candidates:
+        plan = build(name)
+        if plan["estimated_seconds"] <= budget:
+            return plan
+
+    # 가장 빠른 등급으로도 예산을 넘으면 분석할 프레임 수를 예산에 맞춥니다.
+    plan = build('fast')
+    affordable = max(0.0, budget - frame_count * decode_seconds) / frame_seconds(plan["model_complexity"])
+    target_fps = max(MIN_TARGET_FPS, min(plan["target_fps"], fps * affordable / frame_count))
+    return build('fast', target_fps)
+
+def escalate_near_best(video_file, track, pose_similarities, fps, timings, model_complexity=ESCALATION_MODEL_COMPLEXITY):
+    """포즈별 결과 프레임 앞뒤 ESCALATION_WINDOW_SECONDS 구간을 더 무거운 모델로 다시 추론합니다.
+
+    구간의 모든 프레임을 순서대로 추론하여 추적 상태를 이어가고, track에 있는 프레임의 랜드마크만
+    새 결과로 바꿉니다. (인식하지 못한 프레임은 기존 값 유지) 바꾼 프레임 수를 반환하며,
+    호출한 쪽에서 replay_track으로 추적 상태를 다시 계산합니다.
+    """
+    import cv2
+    window = int(round(ESCALATION_WINDOW_SECONDS * fps))
+    ranges = []
+    for frame_index in sorted(set(index for index in selected_frame_indices(pose_similarities).values()
+                                  if index is not None)):
+        start, end = max(0, frame_index - window), frame_index + window
+        if ranges and start <= ranges[-1][1] + 1:
+            ranges[-1][1] = max(ranges[-1][1], end)
+        else:
+            ranges.append([start, end])
+    if not ranges:
+        return 0
+
+    positions = {frame_index: position for position, (frame_index, _) in enumerate(track)}
+    estimator = get_default_estimator(model_complexity)
+    replaced = 0
+    inferred = 0
+    inference_time = 0.0
+    cap = cv2.VideoCapture(video_file)
+    try:
+        for start, end in ranges:
+            estimator.reset()
+            cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+            if int(cap.get(cv2.CAP_PROP_POS_FRAMES)) != start:
+                cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                if not skip_frames(cap, start):
+                    break
+            for frame_index in range(start, end + 1):
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                inference_start = time.perf_counter()
+                landmarks = extract_landmarks_from_image(frame, estimator)
+                inference_time += time.perf_counter() - inference_start
+                inferred += 1
+                if landmarks is not None and frame_index in positions:
+                    track[positions[frame_index]] = (frame_index, landmarks)
+                    replaced += 1
+    finally:
+        cap.release()
+    timings["escalation_inference"] = inference_time
+    if inferred:
+        record_throughput(model_complexity, inference_time / inferred)
+    return replaced
+
+def fetch_frames(video_file, frame_indices):
+    """영상을 다시 열어 지정한 프레임 번호의 이미지만 {번호: 프레임} 형태로 읽어옵니다.
+
+    가까운 프레임은 순서대로 건너뛰고, 멀리 떨어진 프레임은 탐색(seek)합니다.
+    탐색 위치가 맞지 않는 영상은 처음부터 순서대로 읽습니다.
+    """
+    import cv2
+    targets = sorted(set(index for index in frame_indices if index is not None))
+    frames = {}
+    if not targets:
+        return frames
+    cap = cv2.VideoCapture(video_file)
+    try:
+        position = 0
+        for target in targets:
+            if target - position > FRAME_SEEK_DISTANCE:
+                cap.set(cv2.CAP_PROP_POS_FRAMES, target)
+                if int(cap.get(cv2.CAP_PROP_POS_FRAMES)) == target:
+                    position = target
+                else:
+                    logging.warning(f"프레임 탐색 위치가 맞지 않아 처음부터 읽습니다: {target}")
+                    cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                    position = 0
+            if not skip_frames(cap, target - position):
+                break
+            ret, frame = cap.read()
+            if not ret:
+                break
+            frames[target] = frame
+            position = target + 1
+    finally:
+        cap.release()
+    missing = [index for index in targets if index not in frames]
+    if missing:
+        logging.error(f"선택된 프레임을 다시 읽을 수 없습니다: {missing}")
+    return frames
+
+def create_save_folder(user_id, timestamp):
+    """결과 저장 폴더를 만들고 폴더 이름을 반환합니다. 같은 초에 분석된 작업끼리는 번호를 붙여 구분합니다."""
+    folder_name = f"{user_id}_{timestamp}"
+    suffix = 1
+    while True:
+        try:
+            os.makedirs(os.path.join(USER_POSE_DATA_FOLDER, folder_name))
+            return folder_name
+        except FileExistsError:
+            folder_name = f"{user_id}_{timestamp}_{suffix}"
+            suffix += 1
+
+def summarize_pose_results(pose_similarities, standard_poses):
+    """추적 상태에서 포즈별 결과 프레임 번호, 유사도, 기준 변형, 피드백을 정리합니다.
+
+    인식하지 못한 포즈는 None입니다.
+    """
+    summary = {}
     for idx, data in pose_similarities.items():
         average_similarity = data.get("average_similarity", 0)
-        frame = data.get("frame", None)
-        individual_similarities = data.get("individual_similarities", [])
-        comprehensive_similarities = data.get("comprehensive_similarities", {})
+        frame_index = data.get("frame_index", None)
         similarity_percentage = f"{average_similarity * 100:.2f}%" if average_similarity > 0 else "0.00%"
 
-        if frame is None:
-            frame = data.get("max_frame", None)
+        if frame_index is None:
+            frame_index = data.get("max_frame_index", None)
             user_coords = data.get("user_coords_max")
             best_standard_coords = data.get("best_standard_coords_max")
-            if frame is not None:
+            if frame_index is not None:
                 similarity_sum = data.get("max_similarity_sum", 0)
                 pose_count = len(standard_poses[idx])
                 if pose_count > 0:
@@ -429,39 +1875,154 @@ def analyze_user_video(video_file, user_id):
             user_coords = data.get("user_coords")
             best_standard_coords = data.get("best_standard_coords")
 
-        if frame is not None:
-            image_filename = f"user_pose_{idx}_{timestamp}.jpg"
-            image_path = os.path.join(save_folder, image_filename)
-            cv2.imwrite(image_path, frame)
+        if frame_index is None:
+            summary[idx] = None
+            continue
 
-            similarities = data["individual_similarities"]
-            max_similarity = data["max_similarity_sum"]
-            try:
-                max_variation = similarities.index(max_similarity) + 1
-                if max_variation > 4:
-                    max_variation = 1
-            except ValueError:
+        similarities = data["individual_similarities"]
+        max_similarity = data["max_similarity_sum"]
+        try:
+            max_variation = similarities.index(max_similarity) + 1
+            if max_variation > 4:
                 max_variation = 1
-                logging.warning(f"포즈 {idx}의 최대 유사도 변형을 찾을 수 없습니다. 기본값 1을 사용합니다.")
+        except ValueError:
+            max_variation = 1
+            logging.warning(f"포즈 {idx}의 최대 유사도 변형을 찾을 수 없습니다. 기본값 1을 사용합니다.")
 
-            pro_image_path = os.path.join(PROFESSIONAL_POSE_FOLDER, f'pose{idx}-{max_variation}.jpg')
+        # 사용자 자세에 대한 피드백 생성
+        feedback = []
+        if user_coords is not None and best_standard_coords is not None:
+            feedback.append(analyze_hip_flexion(user_coords, best_standard_coords))
+            feedback.append(analyze_position_distance(user_coords, best_standard_coords))
+            feedback.append(analyze_arm_height(user_coords, best_standard_coords))
+            feedback_text = " ".join(feedback)
+        else:
+            feedback_text = "자세 분석을 위한 데이터가 충분하지 않습니다."
 
-            # 사용자 자세에 대한 피드백 생성
-            feedback = []
-            if user_coords is not None and best_standard_coords is not None:
-                feedback.append(analyze_hip_flexion(user_coords, best_standard_coords))
-                feedback.append(analyze_position_distance(user_coords, best_standard_coords))
-                feedback.append(analyze_arm_height(user_coords, best_standard_coords))
-                feedback_text = " ".join(feedback)
-            else:
-                feedback_text = "자세 분석을 위한 데이터가 충분하지 않습니다."
+        summary[idx] = {
+            "frame_index": frame_index,
+            "similarity": similarity_percentage,
+            "feedback": feedback_text,
+            "max_variation": max_variation
+        }
+    return summary
+
+def selected_frame_indices(pose_similarities):
+    """추적 상태에서 포즈별 결과 프레임 번호를 반환합니다. (summarize_pose_results와 같은 선택 기준)"""
+    return {
+        idx: data["frame_index"] if data["frame_index"] is not None else data["max_frame_index"]
+        for idx, data in pose_similarities.items()
+    }
+
+def resize_to_fit(image, max_size):
+    """긴 변이 max_size(px)를 넘으면 비율을 유지하여 축소합니다."""
+    import cv2
+    height, width = image.shape[:2]
+    scale = max_size / max(height, width) if max_size else 1.0
+    if scale >= 1.0:
+        return image
+    size = (max(1, int(round(width * scale))), max(1, int(round(height * scale))))
+    return cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+
+class PoseImageWriter:
+    """결과 이미지를 백그라운드 스레드에서 축소/인코딩하여 저장합니다.
+
+    submit은 이미지를 큐에 넣고 바로 반환하므로, 그동안 호출한 쪽에서 피드백 생성 등을 계속할 수 있습니다.
+    close는 모든 이미지가 저장될 때까지 기다린 뒤 저장에 성공한 ({포즈 번호: 웹 경로}, {포즈 번호: 썸네일 웹 경로})를 반환합니다.
+    """
 
+    def __init__(self, save_folder_name, timestamp, image_format=OUTPUT_IMAGE_FORMAT, max_size=OUTPUT_IMAGE_MAX_SIZE,
+                 quality=OUTPUT_IMAGE_QUALITY, thumbnail_size=OUTPUT_THUMBNAIL_SIZE):
+        if image_format not in OUTPUT_IMAGE_FORMATS:
+            raise PoseAnalysisError(f"지원하지 않는 이미지 형식입니다: {image_format}")
+        self.save_folder_name = save_folder_name
+        self.timestamp = timestamp
+        self.image_format = image_format
+        self.max_size = max_size
+        self.quality = quality
+        self.thumbnail_size = thumbnail_size
+        self.image_urls = {}
+        self.thumbnail_urls = {}
+        self.pending = queue.Queue()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _encode_params(self):
+        import cv2
+        if self.image_format == 'webp':
+            return [cv2.IMWRITE_WEBP_QUALITY, int(self.quality)]
+        return [cv2.IMWRITE_JPEG_QUALITY, int(self.quality)]
+
+    def _write(self, filename, image, max_size):
+        import cv2
+        path = os.path.join(USER_POSE_DATA_FOLDER, self.save_folder_name, filename)
+        if not cv2.imwrite(path, resize_to_fit(image, max_size), self._encode_params()):
+            raise OSError(f"이미지를 저장할 수 없습니다: {path}")
+        metrics.inc("images_written", format=self.image_format)
+        metrics.inc("image_bytes_written", os.path.getsize(path), format=self.image_format)
+        return f"/user_pose_data/{self.save_folder_name}/{filename}"
+
+    def _run(self):
+        while True:
+            item = self.pending.get()
+            if item is _PIPELINE_END:
+                return
+            idx, frame = item
+            start = time.perf_counter()
+            stem = f"user_pose_{idx}_{self.timestamp}"
+            try:
+                self.image_urls[idx] = self._write(f"{stem}.{self.image_format}", frame, self.max_size)
+            except Exception as e:
+                logging.error(f"포즈 {idx} 이미지 저장 실패: {e}")
+            # 썸네일이 없으면 화면에서 원본 이미지를 대신 사용하므로, 썸네일 실패는 원본 결과에 영향을 주지 않습니다.
+            if self.thumbnail_size and idx in self.image_urls:
+                try:
+                    self.thumbnail_urls[idx] = self._write(f"{stem}_thumb.{self.image_format}", frame,
+                                                           self.thumbnail_size)
+                except Exception as e:
+                    logging.error(f"포즈 {idx} 썸네일 저장 실패: {e}")
+            metrics.observe("stage_seconds", time.perf_counter() - start, stage="image_write")
+
+    def submit(self, idx, frame):
+        """포즈 idx의 결과 프레임 저장을 예약합니다."""
+        self.pending.put((idx, frame))
+
+    def close(self):
+        """예약된 이미지를 모두 저장할 때까지 기다립니다."""
+        self.pending.put(_PIPELINE_END)
+        self.thread.join()
+        return self.image_urls, self.thumbnail_urls
+
+def write_pose_images(summary, frames, save_folder_name, timestamp, image_options=None):
+    """포즈별 선택 프레임을 결과 폴더에 저장하고 ({포즈 번호: 웹 경로}, {포즈 번호: 썸네일 웹 경로})를 반환합니다.
+
+    image_options는 PoseImageWriter의 형식/크기/품질 인자입니다.
+    """
+    writer = PoseImageWriter(save_folder_name, timestamp, **(image_options or {}))
+    for idx, result in summary.items():
+        if result is not None and frames.get(result["frame_index"]) is not None:
+            writer.submit(idx, frames[result["frame_index"]])
+    return writer.close()
+
+def build_comments(summary, image_urls, require_image=True, thumbnail_urls=None):
+    """포즈별 결과와 사용자 이미지 경로로 응답용 comments를 만듭니다.
+
+    require_image=True이면 이미지가 없는 포즈는 인식하지 못한 것으로 처리합니다.
+    썸네일이 있는 포즈에는 "user_thumbnail" 경로를 추가합니다.
+    """
+    thumbnail_urls = thumbnail_urls or {}
+    comments = {}
+    for idx, result in summary.items():
+        image_url = image_urls.get(idx)
+        if result is not None and (image_url is not None or not require_image):
             comments[f"포즈 {idx}"] = {
-                "user_image": f"/user_pose_data/{user_id}_{timestamp}/{image_filename}",
-                "similarity": similarity_percentage,
-                "feedback": feedback_text,
-                "professional_image": f"/professional_poses/pose{idx}-{max_variation}.jpg"
+                "user_image": image_url,
+                "similarity": result["similarity"],
+                "feedback": result["feedback"],
+                "professional_image": f"/professional_poses/pose{idx}-{result['max_variation']}.jpg"
             }
+            if idx in thumbnail_urls:
+                comments[f"포즈 {idx}"]["user_thumbnail"] = thumbnail_urls[idx]
         else:
             comments[f"포즈 {idx}"] = {
                 "user_image": None,
@@ -469,6 +2030,796 @@ def analyze_user_video(video_file, user_id):
                 "feedback": "포즈를 인식하지 못했습니다.",
                 "professional_image": f"/professional_poses/pose{idx}-1.jpg"
             }
+    return comments
+
+def save_landmark_track(path, track, fps, video_file, sampling):
+    """분석한 프레임의 번호와 원본 랜드마크를 압축 npz 파일로 저장합니다.
+
+    Mediapipe 좌표는 float32이므로 float32로 저장해도 값이 그대로 보존됩니다.
+    랜드마크를 인식하지 못한 프레임은 detected=False, 좌표는 NaN으로 기록합니다.
+    """
+    frame_indices = np.array([frame_index for frame_index, _ in track], dtype=np.int64)
+    landmarks = np.full((len(track), len(USED_LANDMARKS), 3), np.nan, dtype=np.float32)
+    detected = np.zeros(len(track), dtype=bool)
+    for i, (_, coords) in enumerate(track):
+        if coords is not None:
+            landmarks[i] = coords
+            detected[i] = True
+    try:
+        np.savez_compressed(
+            path,
+            version=np.array(TRACK_VERSION),
+            used_landmarks=np.array(USED_LANDMARKS),
+            fps=np.array(fps),
+            video_file=np.array(os.path.abspath(video_file)),
+            sampling=np.array(sampling),
+            frame_indices=frame_indices,
+            detected=detected,
+            landmarks=landmarks
+        )
+    except OSError as e:
+        logging.error(f"랜드마크 트랙 저장 중 오류 발생: {e}")
+
+def load_landmark_track(path):
+    """save_landmark_track으로 저장한 트랙을 [(프레임 번호, 랜드마크 또는 None), ...]과 메타데이터로 읽습니다."""
+    with np.load(path, allow_pickle=False) as data:
+        if int(data['version']) != TRACK_VERSION or data['used_landmarks'].tolist() != USED_LANDMARKS:
+            raise PoseAnalysisError(f"지원하지 않는 랜드마크 트랙 형식입니다: {path}")
+        landmarks = data['landmarks'].astype(np.float64)
+        track = [
+            (frame_index, landmarks[i] if detected else None)
+            for i, (frame_index, detected) in enumerate(zip(data['frame_indices'].tolist(), data['detected'].tolist()))
+        ]
+        metadata = {
+            "fps": float(data['fps']),
+            "video_file": str(data['video_file']),
+            "sampling": str(data['sampling'])
+        }
+    return track, metadata
+
+def replay_track(track, reference_set, pose_similarities, pose_held_frames):
+    """(프레임 번호, 원본 랜드마크 또는 None) 트랙을 순서대로 채점하여 추적 상태를 갱신합니다.
+
+    간격은 트랙의 직전 항목과의 프레임 번호 차이이므로, 분석 당시와 같은 연속 유지 조건이 적용됩니다.
+    """
+    previous_index = -1
+    for frame_index, landmarks in track:
+        gap = frame_index - previous_index
+        previous_index = frame_index
+        if landmarks is None:
+            continue
+        normalized_landmarks = normalize_pose(landmarks)
+        final_similarity, comprehensive_similarities = score_frames(normalized_landmarks, reference_set)
+        results = select_best_matches(final_similarity, comprehensive_similarities, reference_set)
+        update_pose_tracking_state(pose_similarities, pose_held_frames, results, frame_index, normalized_landmarks, gap)
+
+def rescore_track(track_path, standard_poses=None, with_images=False, matcher='frame', image_options=None):
+    """저장된 랜드마크 트랙만으로 유사도와 피드백을 다시 계산하여 comments를 반환합니다.
+
+    Mediapipe를 다시 실행하지 않으므로 가중치/임계값 조정이나 기준 포즈 추가 후 기존 기록을 빠르게 재평가할 수 있습니다.
+    with_images=True이고 원본 영상이 남아 있으면 새로 선택된 프레임 이미지를 트랙 폴더에 저장합니다.
+    matcher='sequence'이면 트랙 전체를 포즈 순서대로 정렬합니다. (sequence_tracking_state 참고)
+    image_options는 write_pose_images에 전달됩니다.
+    """
+    if standard_poses is None:
+        standard_poses = load_standard_poses()
+    if not standard_poses:
+        raise PoseAnalysisError("기준 포즈를 로드할 수 없습니다.")
+    reference_set = prepare_reference_set(standard_poses)
+    track, metadata = load_landmark_track(track_path)
+
+    if matcher == 'sequence':
+        pose_similarities = sequence_tracking_state(track, reference_set, metadata["fps"])
+    else:
+        pose_similarities, pose_held_frames = create_pose_tracking_state(standard_poses.keys())
+        replay_track(track, reference_set, pose_similarities, pose_held_frames)
+
+    summary = summarize_pose_results(pose_similarities, standard_poses)
+    image_urls, thumbnail_urls = {}, {}
+    if with_images and os.path.exists(metadata["video_file"]):
+        save_folder_name = os.path.basename(os.path.dirname(os.path.abspath(track_path)))
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        frames = fetch_frames(metadata["video_file"], [
+            result["frame_index"] for result in summary.values() if result is not None
+        ])
+        image_urls, thumbnail_urls = write_pose_images(summary, frames, save_folder_name, timestamp, image_options)
+    return build_comments(summary, image_urls, require_image=with_images, thumbnail_urls=thumbnail_urls)
+
+def rescore_directory(folder, standard_poses=None, with_images=False, matcher='frame', image_options=None):
+    """폴더 아래의 모든 랜드마크 트랙을 재평가하여 트랙 옆에 RESCORE_FILENAME으로 저장합니다.
+
+    처리 결과 요약 {"total", "done", "failed"}를 반환합니다.
+    """
+    if standard_poses is None:
+        standard_poses = load_standard_poses()
+    summary = {"total": 0, "done": 0, "failed": []}
+    for root, _, files in sorted(os.walk(folder)):
+        if TRACK_FILENAME not in files:
+            continue
+        track_path = os.path.join(root, TRACK_FILENAME)
+        summary["total"] += 1
+        try:
+            comments = rescore_track(track_path, standard_poses=standard_poses, with_images=with_images,
+                                     matcher=matcher, image_options=image_options)
+            write_json_atomic(os.path.join(root, RESCORE_FILENAME), comments)
+            summary["done"] += 1
+        except Exception as e:
+            logging.error(f"재평가 실패 ({track_path}): {e}")
+            summary["failed"].append({"track_path": track_path, "error": str(e)})
+    return summary
+
+def result_cache_key(video_file, standard_poses, **options):
+    """영상 내용 해시, 기준 포즈, 채점 설정(options 포함)으로 결과 캐시 키를 만듭니다. 영상이 없으면 None입니다."""
+    video_hash = file_sha1(video_file)
+    if not video_hash:
+        return None
+    reference_digest = hashlib.sha1()
+    for idx in sorted(standard_poses):
+        for coords in standard_poses[idx]:
+            reference_digest.update(f"{idx}:".encode())
+            reference_digest.update(np.ascontiguousarray(coords, dtype=np.float64).tobytes())
+    key_data = {
+        "version": RESULT_CACHE_VERSION,
+        "video": video_hash,
+        "reference": reference_digest.hexdigest(),
+        "scoring": [SIMILARITY_THRESHOLD, CONSECUTIVE_REQUIRED, EARLY_STOP_SIMILARITY, EARLY_STOP_PATIENCE,
+                    SEQUENCE_MAX_GAP_SECONDS, USED_LANDMARKS],
+        "options": options
+    }
+    return hashlib.sha1(json.dumps(key_data, sort_keys=True).encode()).hexdigest()
+
+def load_cached_result(key, cache_folder=RESULT_CACHE_FOLDER):
+    """캐시에 저장된 comments를 반환합니다. 없으면 None이며, 읽은 항목은 최근 사용으로 표시합니다."""
+    entry_path = os.path.join(cache_folder, key, RESULT_CACHE_FILENAME)
+    try:
+        with open(entry_path, encoding='utf-8') as f:
+            comments = json.load(f)
+    except (OSError, ValueError):
+        return None
+    try:
+        os.utime(entry_path)
+    except OSError:
+        pass
+    return comments
+
+def copy_result_images(comments, target_folder, folder_name):
+    """comments의 사용자 이미지를 target_folder로 복사하고, 이미지 URL이 folder_name 아래 복사본을 가리키는 새 comments를 반환합니다.
+
+    folder_name은 USER_POSE_DATA_FOLDER 기준 상대 경로이며, target_folder와 다를 수 있습니다. (임시 폴더에 복사 후 이름 변경)
+    """
+    url_prefix = "/user_pose_data/" + folder_name.replace(os.sep, '/')
+    copied = {}
+    for pose_name, comment in comments.items():
+        comment = dict(comment)
+        for image_key in ("user_image", "user_thumbnail"):
+            if comment.get(image_key):
+                image_path = os.path.join(PROJECT_ROOT, *comment[image_key].lstrip('/').split('/'))
+                image_filename = os.path.basename(image_path)
+                shutil.copy2(image_path, os.path.join(target_folder, image_filename))
+                comment[image_key] = f"{url_prefix}/{image_filename}"
+        copied[pose_name] = comment
+    return copied
+
+def store_cached_result(key, comments, cache_folder=RESULT_CACHE_FOLDER):
+    """comments와 사용자 이미지를 캐시 항목 폴더로 복사하여 저장합니다.
+
+    캐시 항목의 이미지는 결과 폴더가 지워져도 남도록 항목 폴더 안의 복사본을 가리킵니다.
+    다른 프로세스가 같은 항목을 먼저 저장했으면 기존 항목을 유지합니다.
+    """
+    entry_folder = os.path.join(cache_folder, key)
+    if os.path.exists(entry_folder):
+        return
+    tmp_folder = f"{entry_folder}.{os.getpid()}.tmp"
+    os.makedirs(tmp_folder, exist_ok=True)
+    try:
+        cached_comments = copy_result_images(comments, tmp_folder, os.path.relpath(entry_folder, USER_POSE_DATA_FOLDER))
+        write_json_atomic(os.path.join(tmp_folder, RESULT_CACHE_FILENAME), cached_comments)
+        os.rename(tmp_folder, entry_folder)
+    except OSError as e:
+        logging.warning(f"결과 캐시 저장 실패 ({key}): {e}")
+    finally:
+        shutil.rmtree(tmp_folder, ignore_errors=True)
+
+def evict_result_cache(cache_folder=RESULT_CACHE_FOLDER, max_bytes=RESULT_CACHE_MAX_BYTES,
+                       max_age=RESULT_CACHE_MAX_AGE_SECONDS):
+    """오래된 캐시 항목을 지우고, 전체 크기가 max_bytes를 넘으면 가장 오래 사용하지 않은 항목부터 지웁니다.
+
+    지운 항목 수를 반환합니다.
+    """
+    if not os.path.isdir(cache_folder):
+        return 0
+    now = time.time()
+    entries = []
+    for name in os.listdir(cache_folder):
+        entry_folder = os.path.join(cache_folder, name)
+        entry_path = os.path.join(entry_folder, RESULT_CACHE_FILENAME)
+        if not os.path.isfile(entry_path):
+            continue
+        try:
+            last_used = os.path.getmtime(entry_path)
+            size = sum(entry.stat().st_size for entry in os.scandir(entry_folder) if entry.is_file())
+        except OSError:
+            continue
+        entries.append((last_used, size, entry_folder))
+    entries.sort()
+
+    total = sum(size for _, size, _ in entries)
+    evicted = 0
+    for last_used, size, entry_folder in entries:
+        if now - last_used <= max_age and total <= max_bytes:
+            break
+        shutil.rmtree(entry_folder, ignore_errors=True)
+        total -= size
+        evicted += 1
+    if evicted:
+        metrics.inc("result_cache_evictions", evicted)
+    return evicted
+
+def analyze_user_video(video_file, user_id, standard_poses=None, estimator=None,
+                       sampling='all', stride=1, target_fps=None, pipeline=False, timings=None,
+                       save_track=True, roi=False, roi_size=ROI_INFERENCE_SIZE,
+                       progress=None, progress_interval=PROGRESS_INTERVAL, early_stop=False, matcher='frame',
+                       cache=True, shards=1, image_options=None, tier=None, budget=None):
+    """사용자 동영상을 분석하여 포즈별 피드백(comments)을 반환합니다.
+
+    standard_poses, estimator를 넘기면 상주 워커처럼 미리 준비된 자원을 재사용합니다.
+    sampling/stride/target_fps로 분석할 프레임을 고를 수 있습니다. (FrameSampler 참고)
+    pipeline=True이면 디코딩/추론/집계를 별도 스레드에서 동시에 수행합니다.
+    timings에 dict를 넘기면 단계별 처리 시간(초)과 프레임 수가 채워집니다.
+    save_track=True이면 프레임별 랜드마크를 결과 폴더의 TRACK_FILENAME에 저장합니다. (rescore_track 참고)
+    roi=True이면 선수 주변 영역만 긴 변 roi_size(px)로 축소하여 추론합니다. (RoiTracker 참고)
+    프레임의 긴 변이 roi_size 이하이면 이득이 없으므로 ROI 추론을 자동으로 끕니다.
+    progress에 함수를 넘기면 "started" 이벤트와 progress_interval 프레임마다 포즈별 현재 최고 유사도가 담긴
+    "progress" 이벤트(dict)를 전달합니다.
+    early_stop=True이면 모든 포즈가 안정적으로 높은 유사도에 도달했을 때 남은 프레임을 분석하지 않습니다. (poses_settled 참고)
+    matcher='sequence'이면 포즈별로 따로 고르지 않고, 분석이 끝난 트랙 전체를 포즈 순서대로 한 번에 정렬합니다.
+    (sequence_tracking_state 참고)
+    cache=True이면 같은 영상과 설정의 이전 결과를 RESULT_CACHE_FOLDER에서 찾아 분석 없이 반환합니다.
+    이때 이미지는 새 결과 폴더로 복사하므로 반환된 URL은 캐시 항목이 지워져도 유효합니다. (result_cache_key 참고)
+    shards가 2 이상이면 영상을 시간 구간으로 나누어 여러 프로세스에서 동시에 분석합니다. (run_sharded_scan 참고)
+    이때 pipeline, early_stop은 사용하지 않고 estimator 대신 프로세스마다 Pose 인스턴스를 만듭니다.
+    image_options는 결과 이미지 형식/크기/품질 설정입니다. (PoseImageWriter 참고)
+    tier("fast"/"balanced"/"accurate") 또는 budget(초)을 지정하면 plan_analysis로 모델 복잡도와 샘플링을 정하며,
+    이때 sampling/stride/target_fps는 무시합니다. 고른 등급과 실제 초당 분석 프레임 수는 timings에 기록됩니다.
+    """
+    import cv2
+    if sampling not in SAMPLING_MODES:
+        raise PoseAnalysisError(f"지원하지 않는 샘플링 모드입니다: {sampling}")
+    if matcher not in MATCHERS:
+        raise PoseAnalysisError(f"지원하지 않는 매칭 방식입니다: {matcher}")
+    if tier is not None and tier not in QUALITY_TIERS:
+        raise PoseAnalysisError(f"지원하지 않는 품질 등급입니다: {tier}")
+    if standard_poses is None:
+        standard_poses = load_standard_poses()
+    if not standard_poses:
+        logging.error("기준 포즈를 로드할 수 없습니다.")
+        raise PoseAnalysisError("기준 포즈를 로드할 수 없습니다.")
+    if timings is None:
+        timings = {}
+
+    cache_key = None
+    if cache:
+        cache_key = result_cache_key(
+            video_file, standard_poses, sampling=sampling, stride=stride, target_fps=target_fps, roi=roi,
+            roi_size=roi_size, early_stop=early_stop, matcher=matcher, image_options=image_options,
+            tier=tier, budget=budget
+        )
+        comments = load_cached_result(cache_key) if cache_key is not None else None
+        if comments is not None:
+            # 캐시 항목은 교체될 수 있고 다른 회원의 결과일 수도 있으므로, 이미지를 이 회원의 결과 폴더로 복사해 반환합니다.
+            save_folder_name = create_save_folder(user_id, datetime.now().strftime("%Y%m%d_%H%M%S"))
+            save_folder = os.path.join(USER_POSE_DATA_FOLDER, save_folder_name)
+            try:
+                comments = copy_result_images(comments, save_folder, save_folder_name)
+            except OSError as e:
+                logging.warning(f"캐시된 이미지 복사 실패, 다시 분석합니다 ({cache_key}): {e}")
+                shutil.rmtree(save_folder, ignore_errors=True)
+                comments = None
+        timings["cache"] = "miss" if comments is None else "hit"
+        metrics.inc("result_cache_lookups", result=timings["cache"])
+        if comments is not None:
+            logging.info(f"캐시된 분석 결과를 반환합니다: {video_file} ({cache_key})")
+            return comments
+    reference_set = prepare_reference_set(standard_poses)
+
+    cap = cv2.VideoCapture(video_file)
+    if not cap.isOpened():
+        logging.error("동영상을 열 수 없습니다.")
+        raise PoseAnalysisError(f"동영상을 열 수 없습니다: {video_file}")
+
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    save_folder_name = create_save_folder(user_id, timestamp)
+    save_folder = os.path.join(USER_POSE_DATA_FOLDER, save_folder_name)
+
+    fps = cap.get(cv2.CAP_PROP_FPS) or DEFAULT_VIDEO_FPS
+    frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) or None
+    # 코어보다 많은 구간은 같은 코어를 나눠 쓰므로 오히려 느려집니다. (코어가 하나면 분할하지 않습니다)
+    sharded = min(shards, cpu_count()) > 1 and frame_count is not None
+    long_side = max(cap.get(cv2.CAP_PROP_FRAME_WIDTH), cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    if roi and long_side <= roi_size:
+        # 프레임이 이미 ROI 입력 크기 이하이면 잘라 내도 추론 비용이 줄지 않으므로 전체 프레임으로 추론합니다.
+        logging.info(f"프레임 긴 변({long_side:.0f}px)이 ROI 크기 이하이므로 ROI 추론을 사용하지 않습니다.")
+        roi = False
+
+    plan = None
+    model_complexity = DEFAULT_MODEL_COMPLEXITY
+    if tier is not None or budget is not None:
+        plan = plan_analysis(frame_count, fps, tier, budget, pose_count=len(standard_poses))
+        model_complexity = plan["model_complexity"]
+        sampling, target_fps = ('all', None) if plan["target_fps"] is None else ('fps', plan["target_fps"])
+        timings.update({
+            "tier": plan["tier"], "model_complexity": model_complexity, "target_fps": plan["target_fps"],
+            "estimated_seconds": plan["estimated_seconds"]
+        })
+        # 넘겨받은 Pose 인스턴스는 기본 모델이므로 다른 모델은 프로세스별 인스턴스를 사용합니다.
+        if estimator is not None and model_complexity != DEFAULT_MODEL_COMPLEXITY:
+            estimator = get_default_estimator(model_complexity)
+    sampler = FrameSampler(sampling, fps, stride=stride, target_fps=target_fps)
+    pose_similarities, pose_held_frames = create_pose_tracking_state(standard_poses.keys())
+
+    # 기준 포즈 로드나 이전 영상의 추적 상태가 섞이지 않도록 영상마다 추적 상태를 초기화합니다.
+    owns_estimator = estimator is None and not sharded
+    if owns_estimator:
+        estimator = create_pose_estimator(model_complexity)
+    elif estimator is not None:
+        estimator.reset()
+
+    if progress is not None:
+        progress({
+            "event": "started", "video_path": video_file, "user_id": user_id,
+            "fps": fps, "frame_count": frame_count, "sampling": sampling, "tier": timings.get("tier")
+        })
+    analyzed_frames = 0
+    timings["early_stop_frame"] = None
+
+    def on_frame(frame_index):
+        nonlocal analyzed_frames
+        analyzed_frames += 1
+        if progress is not None and analyzed_frames % progress_interval == 0:
+            progress({
+                "event": "progress", "frame_index": frame_index, "frames_analyzed": analyzed_frames,
+                "frame_count": frame_count,
+                "best_similarity": {
+                    str(idx): round(similarity, 4)
+                    for idx, similarity in current_best_similarities(pose_similarities, standard_poses).items()
+                }
+            })
+        if early_stop and poses_settled(pose_similarities, frame_index):
+            timings["early_stop_frame"] = frame_index
+            return True
+        return False
+
+    def on_segment(segments_done, segment_count, frames_analyzed):
+        if progress is not None:
+            progress({
+                "event": "progress", "segments_done": segments_done, "segments": segment_count,
+                "frames_analyzed": frames_analyzed, "frame_count": frame_count
+            })
+
+    escalate = plan is not None and plan["escalate"]
+    track = [] if save_track or matcher == 'sequence' or escalate else None
+    roi_tracker = RoiTracker(roi_size) if roi and not sharded else None
+    scan = run_pipelined_scan if pipeline else run_serial_scan
+    # 순서 정렬은 분석이 끝난 트랙으로 한 번에 하므로 스캔 중에는 프레임별 유사도를 계산하지 않고 트랙만 모읍니다.
+    scan_reference_set = None if matcher == 'sequence' else reference_set
+    analysis_failed = False
+    try:
+        if sharded:
+            cap.release()
+            run_sharded_scan(
+                video_file, frame_count, fps, shards, standard_poses, scan_reference_set, pose_similarities,
+                pose_held_frames, timings, track,
+                sampler_options={"mode": sampling, "fps": fps, "stride": stride, "target_fps": target_fps},
+                roi_size=roi_size if roi else None, on_segment=on_segment, model_complexity=model_complexity
+            )
+        else:
+            scan(cap, sampler, estimator, scan_reference_set, pose_similarities, pose_held_frames, timings, track,
+                 roi_tracker, on_frame)
+    except Exception as e:
+        analysis_failed = True
+        metrics.inc("analysis_errors")
+        logging.error(f"영상 분석 중 오류 발생: {e}")
+    finally:
+        cap.release()
+        if owns_estimator:
+            estimator.close()
+    if roi_tracker is not None:
+        timings["roi_frames"] = roi_tracker.roi_frames
+        timings["full_frame_searches"] = roi_tracker.full_frame_searches
+    frames_analyzed = timings.get("frames_analyzed", 0)
+    timings["analysis_fps"] = frames_analyzed / timings["wall"] if timings.get("wall") else 0.0
+    # 처리량 프로필은 품질 등급/시간 예산 계획에만 쓰이므로, 계획을 요청한 분석만 측정값을 남깁니다.
+    if plan is not None and not analysis_failed and frames_analyzed:
+        record_throughput(
+            model_complexity,
+            sum(timings.get(stage, 0.0) for stage in PIPELINE_STAGES if stage != 'decode') / frames_analyzed,
+            timings.get("decode", 0.0) / max(1, timings.get("frames_decoded", 0))
+        )
+    if escalate and not analysis_failed:
+        timings["escalation"] = 0.0
+        start = time.perf_counter()
+        if matcher == 'sequence':
+            # 스캔 중 집계를 하지 않았으므로 순서 정렬 결과의 프레임 주변을 다시 추론합니다.
+            pose_similarities = sequence_tracking_state(track, reference_set, fps)
+        timings["escalated_frames"] = escalate_near_best(video_file, track, pose_similarities, fps, timings)
+        if timings["escalated_frames"] and matcher != 'sequence':
+            pose_similarities, pose_held_frames = create_pose_tracking_state(standard_poses.keys())
+            replay_track(track, reference_set, pose_similarities, pose_held_frames)
+        record_stage(timings, "escalation", start)
+    metrics.inc("videos_analyzed")
+    metrics.observe("video_seconds", timings.get("wall", 0.0))
+    logging.info(
+        f"분석한 프레임: {timings.get('frames_analyzed', 0)}개 / 디코딩한 프레임: {timings.get('frames_decoded', 0)}개 / "
+        f"랜드마크를 인식하지 못한 프레임: {timings.get('frames_analyzed', 0) - timings.get('frames_detected', 0)}개 "
+        f"(샘플링: {sampling}, 파이프라인: {pipeline}, 조기 종료 프레임: {timings['early_stop_frame']}) 단계별 시간: "
+        + ", ".join(f"{stage}={timings.get(stage, 0):.3f}s" for stage in PIPELINE_STAGES + ('wall',))
+    )
+
+    if save_track:
+        save_landmark_track(os.path.join(save_folder, TRACK_FILENAME), track, fps, video_file, sampling)
+    if matcher == 'sequence':
+        timings["sequence"] = 0.0
+        start = time.perf_counter()
+        pose_similarities = sequence_tracking_state(track, reference_set, fps)
+        record_stage(timings, "sequence", start)
+
+    # 결과 준비: 포즈별로 선택된 프레임만 다시 읽어오고, 이미지 저장과 피드백 생성을 동시에 진행합니다.
+    frame_indices = selected_frame_indices(pose_similarities)
+    selected_frames = fetch_frames(video_file, frame_indices.values())
+    writer = PoseImageWriter(save_folder_name, timestamp, **(image_options or {}))
+    for idx, frame_index in frame_indices.items():
+        if selected_frames.get(frame_index) is not None:
+            writer.submit(idx, selected_frames[frame_index])
+    summary = summarize_pose_results(pose_similarities, standard_poses)
+    image_urls, thumbnail_urls = writer.close()
+    comments = build_comments(summary, image_urls, thumbnail_urls=thumbnail_urls)
+    # 분석 중 오류가 난 결과는 다음 요청에서 다시 분석하도록 저장하지 않습니다.
+    if cache_key is not None and not analysis_failed:
+        store_cached_result(cache_key, comments)
+        evict_result_cache()
+    return comments
+
+def serve(input_stream=None, output_stream=None, metrics_path=None):
+    """표준 입출력 JSON-lines 방식의 상주 분석 워커를 실행합니다.
+
+    한 줄에 하나의 작업 {"id": ..., "video_path": ..., "user_id": ...}을 받아 순서대로 처리하고,
+    {"id": ..., "status": "ok", "result": comments} 또는 {"id": ..., "status": "error", "error": ...}를 한 줄로 응답합니다.
+    작업에 "stream": true를 지정하면 응답 전에 {"id": ..., "status": "progress", "event": ...} 이벤트를 보냅니다.
+    {"command": "reload"}는 기준 포즈를 다시 로드하고, {"command": "metrics"}는 누적 지표 요약을 응답합니다.
+    metrics_path를 지정하면 작업이 끝날 때마다 지표 파일을 갱신합니다. (MetricsRegistry.write 참고)
+    """
+    input_stream = input_stream or sys.stdin
+    output_stream = output_stream or sys.stdout
+
+    def respond(message):
+        output_stream.write(json.dumps(message, ensure_ascii=False) + "\n")
+        output_stream.flush()
+
+    def progress_emitter(job_id):
+        """작업 job_id의 진행 이벤트를 progress 응답으로 보내는 콜백을 만듭니다."""
+        return lambda event: respond({"id": job_id, "status": "progress", **event})
+
+    standard_poses = load_standard_poses()
+    estimator = create_pose_estimator()
+    respond({"status": "ready", "poses": len(standard_poses)})
+
+    try:
+        for line in input_stream:
+            line = line.strip()
+            if not line:
+                continue
+            job_id = None
+            try:
+                job = json.loads(line)
+                job_id = job.get("id")
+                if job.get("command") == "reload":
+                    standard_poses = load_standard_poses()
+                    respond({"id": job_id, "status": "ok", "poses": len(standard_poses)})
+                    continue
+                if job.get("command") == "metrics":
+                    respond({"id": job_id, "status": "ok", "metrics": metrics.snapshot()})
+                    continue
+                timings = {}
+                progress = progress_emitter(job_id) if job.get("stream", False) else None
+                comments = analyze_user_video(
+                    job["video_path"], job["user_id"],
+                    standard_poses=standard_poses, estimator=estimator,
+                    sampling=job.get("sampling", "all"),
+                    stride=job.get("stride", 1),
+                    target_fps=job.get("target_fps"),
+                    pipeline=job.get("pipeline", False),
+                    roi=job.get("roi", False),
+                    roi_size=job.get("roi_size", ROI_INFERENCE_SIZE),
+                    progress=progress,
+                    progress_interval=job.get("progress_interval", PROGRESS_INTERVAL),
+                    early_stop=job.get("early_stop", False),
+                    matcher=job.get("matcher", "frame"),
+                    cache=job.get("cache", True),
+                    shards=job.get("shards", 1),
+                    image_options=job.get("image_options"),
+                    tier=job.get("tier"),
+                    budget=job.get("budget"),
+                    timings=timings
+                )
+                respond({"id": job_id, "status": "ok", "result": comments, "timings": timings})
+            except Exception as e:
+                logging.error(f"작업 처리 중 오류 발생: {e}")
+                respond({"id": job_id, "status": "error", "error": str(e)})
+            if metrics_path:
+                metrics.write(metrics_path)
+    finally:
+        estimator.close()
+
+def is_uuid(text):
+    """웹 서버가 업로드 파일 이름으로 쓰는 UUID 형식인지 확인합니다."""
+    try:
+        uuid.UUID(text)
+    except ValueError:
+        return False
+    return True
+
+def read_batch_jobs(source, default_user_id=None):
+    """배치 작업 목록을 [(영상 경로, 회원 ID), ...] 형태로 읽습니다.
+
+    source가 디렉터리이면 그 안의 영상 파일을 모두 사용하고 회원 ID는 default_user_id 또는 파일 이름으로 정합니다.
+    웹 서버의 업로드 폴더(uploads/userFiles)는 파일 이름이 무작위 UUID라 회원 ID를 알 수 없으므로,
+    default_user_id 없이 UUID 이름의 파일은 회원 ID를 None으로 반환합니다. (run_batch가 작업별 실패로 보고)
+    파일이면 한 줄에 "영상 경로,회원 ID"가 적힌 CSV 매니페스트로 읽으며, 상대 경로는 매니페스트 위치 기준입니다.
+    """
+    jobs = []
+    if os.path.isdir(source):
+        for name in sorted(os.listdir(source)):
+            stem, extension = os.path.splitext(name)
+            if extension.lower() not in VIDEO_EXTENSIONS:
+                continue
+            if default_user_id is None and is_uuid(stem):
+                jobs.append((os.path.join(source, name), None))
+            else:
+                jobs.append((os.path.join(source, name), default_user_id or stem))
+        return jobs
+
+    base_dir = os.path.dirname(os.path.abspath(source))
+    with open(source, newline='', encoding='utf-8') as f:
+        for row in csv.reader(f):
+            if not row or not row[0].strip() or row[0].startswith('#'):
+                continue
+            video_path = row[0].strip()
+            if video_path == "video_path":
+                continue
+            user_id = row[1].strip() if len(row) > 1 and row[1].strip() else default_user_id
+            if user_id is None:
+                user_id = os.path.splitext(os.path.basename(video_path))[0]
+            jobs.append((os.path.join(base_dir, video_path), user_id))
+    return jobs
+
+def batch_result_path(output_dir, video_path, user_id):
+    """배치 작업 결과 JSON 파일 경로를 반환합니다."""
+    stem = os.path.splitext(os.path.basename(video_path))[0]
+    return os.path.join(output_dir, f"{user_id}_{stem}.json")
+
+def write_json_atomic(path, data):
+    """임시 파일에 쓴 뒤 교체하여, 중단되더라도 불완전한 JSON 파일이 남지 않게 합니다."""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=4)
+    os.replace(tmp_path, path)
+
+_batch_worker_state = {}
+
+def _init_batch_worker():
+    """배치 워커 프로세스마다 기준 포즈를 한 번만 준비합니다.
+
+    Pose 인스턴스는 첫 작업에서 get_default_estimator로 만들어 이후 작업에 재사용합니다.
+    """
+    configure_logging()
+    _batch_worker_state["standard_poses"] = load_standard_poses()
+
+def _run_batch_job(job):
+    """배치 워커에서 영상 하나를 분석하고 결과를 저장합니다. (영상, 회원 ID, 오류 메시지)를 반환합니다."""
+    video_path, user_id, output_path, options = job
+    try:
+        comments = analyze_user_video(
+            video_path, user_id,
+            standard_poses=_batch_worker_state["standard_poses"],
+            estimator=get_default_estimator(),
+            **options
+        )
+        write_json_atomic(output_path, comments)
+        return video_path, user_id, None
+    except Exception as e:
+        logging.error(f"배치 작업 실패 ({video_path}): {e}")
+        return video_path, user_id, str(e)
+
+def run_batch(source, output_dir=BATCH_RESULT_FOLDER, processes=None, default_user_id=None, **options):
+    """여러 영상을 프로세스 풀에서 나누어 분석합니다.
+
+    결과 JSON이 이미 있는 작업은 건너뛰므로, 중단된 배치를 같은 명령으로 다시 실행하면 이어서 처리합니다.
+    options는 analyze_user_video의 샘플링/파이프라인 인자로 전달됩니다.
+    작업별 진행 상황은 stderr에 출력하므로 stdout에는 호출자가 출력하는 요약 JSON만 남습니다.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    pending = []
+    skipped = 0
+    unresolved = []
+    for video_path, user_id in read_batch_jobs(source, default_user_id):
+        if user_id is None:
+            error = "파일 이름으로 회원 ID를 알 수 없습니다. 매니페스트(영상 경로,회원 ID)를 사용하세요."
+            unresolved.append({"video_path": video_path, "user_id": None, "error": error})
+            print(f"실패: {video_path} - {error}", file=sys.stderr, flush=True)
+            continue
+        output_path = batch_result_path(output_dir, video_path, user_id)
+        if os.path.exists(output_path):
+            skipped += 1
+            continue
+        pending.append((video_path, user_id, output_path, options))
+
+    summary = {"total": len(pending) + skipped + len(unresolved), "skipped": skipped, "done": 0, "failed": unresolved}
+    if not pending:
+        return summary
+
+    # 워커가 캐시만 읽도록 미리 기준 포즈 캐시를 준비합니다.
+    load_standard_poses()
+    processes = max(1, min(processes or cpu_count(), len(pending)))
+    # fork 시 실행 중인 Mediapipe 그래프 스레드를 물려받지 않도록 spawn을 사용합니다.
+    context = multiprocessing.get_context('spawn')
+    with context.Pool(processes=processes, initializer=_init_batch_worker) as batch_pool:
+        for video_path, user_id, error in batch_pool.imap_unordered(_run_batch_job, pending):
+            if error is None:
+                summary["done"] += 1
+                print(f"완료: {video_path} ({user_id})", file=sys.stderr, flush=True)
+            else:
+                summary["failed"].append({"video_path": video_path, "user_id": user_id, "error": error})
+                print(f"실패: {video_path} ({user_id}) - {error}", file=sys.stderr, flush=True)
+    return summary
+
+def main(argv=None):
+    """명령줄 인자를 해석하여 분석 또는 캐시 재생성을 수행합니다."""
+    parser = argparse.ArgumentParser(description="볼링 자세 분석")
+    parser.add_argument("video_path", nargs="?")
+    parser.add_argument("user_id", nargs="?")
+    parser.add_argument("--rebuild-cache", action="store_true",
+                        help="기준 포즈 랜드마크 캐시를 다시 생성합니다.")
+    parser.add_argument("--serve", action="store_true",
+                        help="표준 입출력으로 작업을 받는 상주 워커로 실행합니다.")
+    parser.add_argument("--sampling", choices=SAMPLING_MODES, default="all",
+                        help="분석할 프레임 선택 방식 (기본값: 모든 프레임)")
+    parser.add_argument("--stride", type=int, default=1,
+                        help="stride 모드에서 분석할 프레임 간격")
+    parser.add_argument("--target-fps", type=float, default=None,
+                        help=f"fps/adaptive 모드의 초당 분석 프레임 수 (기본값: {DEFAULT_TARGET_FPS:g})")
+    parser.add_argument("--pipeline", action="store_true",
+                        help="디코딩/추론/집계를 별도 스레드에서 동시에 수행합니다.")
+    parser.add_argument("--roi", action="store_true",
+                        help="이전 프레임의 선수 주변 영역만 축소하여 추론합니다.")
+    parser.add_argument("--roi-size", type=int, default=ROI_INFERENCE_SIZE,
+                        help=f"ROI 추론 입력의 긴 변 길이(px) (기본값: {ROI_INFERENCE_SIZE})")
+    parser.add_argument("--stream", action="store_true",
+                        help="진행 상황과 최종 결과를 한 줄에 하나씩 JSON 이벤트로 출력합니다.")
+    parser.add_argument("--progress-every", type=int, default=PROGRESS_INTERVAL,
+                        help=f"progress 이벤트를 보낼 분석 프레임 간격 (기본값: {PROGRESS_INTERVAL})")
+    parser.add_argument("--early-stop", action="store_true",
+                        help="모든 포즈가 안정적으로 높은 유사도에 도달하면 분석을 일찍 끝냅니다.")
+    parser.add_argument("--matcher", choices=MATCHERS, default="frame",
+                        help="포즈 프레임 결정 방식: frame은 포즈별 독립 선택, sequence는 포즈 순서대로 한 번에 정렬 (기본값: frame)")
+    parser.add_argument("--shards", type=int, default=1,
+                        help="한 영상을 시간 구간으로 나누어 동시에 분석할 프로세스 수, CPU 코어 수로 제한 (기본값: 1). "
+                             "구간 경계 부근의 결과는 나누지 않은 경우와 조금 다를 수 있습니다.")
+    parser.add_argument("--no-cache", dest="cache", action="store_false",
+                        help="이전 분석 결과 캐시를 사용하지 않고 항상 다시 분석합니다.")
+    parser.add_argument("--tier", choices=QUALITY_TIERS, default=None,
+                        help="품질 등급: 모델 복잡도와 분석 프레임 수를 함께 정합니다. (샘플링 옵션 대신 사용)")
+    parser.add_argument("--budget", type=float, default=None,
+                        help="분석 시간 예산(초): 측정된 처리량으로 예산 안에 드는 가장 정확한 등급을 고릅니다.")
+    parser.add_argument("--image-format", choices=OUTPUT_IMAGE_FORMATS, default=OUTPUT_IMAGE_FORMAT,
+                        help=f"결과 이미지 형식 (기본값: {OUTPUT_IMAGE_FORMAT})")
+    parser.add_argument("--image-max-size", type=int, default=OUTPUT_IMAGE_MAX_SIZE,
+                        help=f"결과 이미지 긴 변의 최대 길이(px), 0이면 원본 크기 (기본값: {OUTPUT_IMAGE_MAX_SIZE})")
+    parser.add_argument("--image-quality", type=int, default=OUTPUT_IMAGE_QUALITY,
+                        help=f"결과 이미지 인코딩 품질 0~100 (기본값: {OUTPUT_IMAGE_QUALITY})")
+    parser.add_argument("--thumbnail-size", type=int, default=OUTPUT_THUMBNAIL_SIZE,
+                        help="지정하면 긴 변이 이 길이(px)인 썸네일을 함께 저장합니다.")
+    parser.add_argument("--metrics", metavar="PATH",
+                        help="분석 지표를 저장할 파일 (.json이면 JSON 요약, 그 외에는 Prometheus 텍스트 형식)")
+    parser.add_argument("--profile", metavar="PATH",
+                        help="샘플링 프로파일러를 켜고 접힌 스택 형식 결과를 저장합니다.")
+    parser.add_argument("--profile-interval", type=float, default=PROFILE_INTERVAL,
+                        help=f"프로파일러 샘플링 간격(초) (기본값: {PROFILE_INTERVAL:g})")
+    parser.add_argument("--timings", action="store_true",
+                        help="단계별 처리 시간을 표준 에러로 출력합니다.")
+    parser.add_argument("--rescore", metavar="PATH",
+                        help="저장된 랜드마크 트랙(파일 또는 결과 폴더)을 Mediapipe 없이 다시 평가합니다.")
+    parser.add_argument("--with-images", action="store_true",
+                        help="재평가 시 원본 영상에서 새로 선택된 프레임 이미지를 저장합니다.")
+    parser.add_argument("--batch", metavar="SOURCE",
+                        help="디렉터리 또는 CSV 매니페스트(영상 경로,회원 ID)의 영상을 모두 분석합니다. "
+                             "디렉터리는 파일 이름을 회원 ID로 쓰며, 이름이 UUID인 업로드 파일은 실패로 보고하므로 매니페스트를 사용하세요.")
+    parser.add_argument("--output-dir", default=BATCH_RESULT_FOLDER,
+                        help="배치 결과 JSON을 저장할 폴더")
+    parser.add_argument("--processes", type=int, default=None,
+                        help="배치 분석에 사용할 프로세스 수 (기본값: CPU 코어 수)")
+    args = parser.parse_args(argv)
+    if args.batch and not os.path.exists(args.batch):
+        parser.error(f"배치 작업 목록을 찾을 수 없습니다: {args.batch}")
+    configure_logging()
+
+    profiler = SamplingProfiler(args.profile_interval).start() if args.profile else None
+    try:
+        run_command(args)
+    finally:
+        if profiler is not None:
+            profiler.stop()
+            profiler.write(args.profile)
+        if args.metrics:
+            metrics.write(args.metrics)
+
+def print_progress_event(event):
+    """진행 이벤트를 한 줄의 JSON으로 stdout에 출력합니다. (--stream)"""
+    print(json.dumps(event, ensure_ascii=False), flush=True)
+
+def run_command(args):
+    """해석된 명령줄 인자에 따라 배치, 상주 워커, 재평가, 캐시 재생성 또는 단일 영상 분석을 수행합니다."""
+    image_options = {
+        "image_format": args.image_format, "max_size": args.image_max_size,
+        "quality": args.image_quality, "thumbnail_size": args.thumbnail_size
+    }
+    if args.batch:
+        summary = run_batch(
+            args.batch, args.output_dir, processes=args.processes,
+            sampling=args.sampling, stride=args.stride, target_fps=args.target_fps, pipeline=args.pipeline,
+            roi=args.roi, roi_size=args.roi_size, early_stop=args.early_stop, matcher=args.matcher,
+            cache=args.cache, image_options=image_options, tier=args.tier, budget=args.budget
+        )
+        print(json.dumps(summary, ensure_ascii=False, indent=4))
+        if summary["failed"]:
+            sys.exit(1)
+        return
+
+    if args.serve:
+        serve(metrics_path=args.metrics)
+        return
+
+    if args.rescore:
+        if os.path.isdir(args.rescore):
+            result = rescore_directory(args.rescore, with_images=args.with_images, matcher=args.matcher,
+                                       image_options=image_options)
+        else:
+            result = rescore_track(args.rescore, with_images=args.with_images, matcher=args.matcher,
+                                   image_options=image_options)
+        print(json.dumps(result, ensure_ascii=False, indent=4))
+        if isinstance(result, dict) and result.get("failed"):
+            sys.exit(1)
+        return
+
+    if args.rebuild_cache:
+        standard_poses = build_reference_cache()
+        count = sum(len(coords) for coords in standard_poses.values())
+        print(f"기준 포즈 캐시 생성 완료: {count}개 ({REFERENCE_CACHE_PATH})")
+        return
+
+    if args.video_path is None or args.user_id is None:
+        print("사용법: python bowling_pose_analysis.py <video_path> <user_id>", file=sys.stderr)
+        sys.exit(1)
+    timings = {}
+    progress = print_progress_event if args.stream else None
+    try:
+        comments = analyze_user_video(
+            args.video_path, args.user_id,
+            sampling=args.sampling, stride=args.stride, target_fps=args.target_fps,
+            pipeline=args.pipeline, roi=args.roi, roi_size=args.roi_size, timings=timings,
+            progress=progress, progress_interval=args.progress_every, early_stop=args.early_stop,
+            matcher=args.matcher, cache=args.cache, shards=args.shards, image_options=image_options,
+            tier=args.tier, budget=args.budget
+        )
+    except PoseAnalysisError as e:
+        if args.stream:
+            progress({"event": "error", "error": str(e)})
+        sys.exit(1)
+    if args.timings:
+        print(json.dumps(timings), file=sys.stderr)
+
+    if args.stream:
+        progress({"event": "result", "comments": comments, "timings": timings})
+        return
 
     try:
         print(json.dumps(comments, ensure_ascii=False, indent=4))
@@ -476,9 +2827,4 @@ def analyze_user_video(video_file, user_id):
         logging.error(f"JSON 변환 중 오류 발생: {e}")
 
 if __name__ == "__main__":
-    if len(sys.argv) < 3:
-        print("사용법: python bowling_pose_analysis.py <video_path> <user_id>", file=sys.stderr)
-        sys.exit(1)
-    VIDEO_FILE = sys.argv[1]
-    USER_ID = sys.argv[2]
-    analyze_user_video(VIDEO_FILE, USER_ID)
+    main()
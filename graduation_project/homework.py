@@ -1,48 +1,486 @@
 import numpy as np
-import matplotlib.pyplot as plt
-from matplotlib import font_manager, rc
+import os
+import sys
+import json
+import time
+import argparse
+import multiprocessing
+from multiprocessing import cpu_count
 
-font_path = r"C:\Windows\Fonts\gulim.ttc"
+# matplotlib은 실행 방식(화면 표시/Agg)을 정한 뒤 사용하는 함수 안에서 불러옵니다.
 
-font_name = font_manager.FontProperties(fname=font_path).get_name()
-rc('font', family=font_name)
+font_path = r"C:\Windows\Fonts\gulim.ttc"
 
 m = 2  # 질량 (kg)
 F_thr = 1  # 추력 입력값 (N)
-a = F_thr / m  # 가속도 (m/s^2)
 t_sim = 10  # 시뮬레이션 시간 (초)
 dt = 0.01  # 시간 간격 (초)
 
-t = np.arange(0, t_sim + dt, dt)
-
-# 위치, 속도, 가속도 계산
-position = 0.5 * a * t**2  
-velocity = a * t  
-acceleration = np.full_like(t, a)  
-
-# 그래프 1: 시간 vs 위치
-plt.figure()
-plt.plot(t, position)
-plt.title('시간(sec) - 위치(m)')
-plt.xlabel('시간 (sec)')
-plt.ylabel('위치 (m)')
-plt.grid(True)
-plt.show()
-
-# 그래프 2: 시간 vs 속도
-plt.figure()
-plt.plot(t, velocity)
-plt.title('시간(sec) - 속도(m/s)')
-plt.xlabel('시간 (sec)')
-plt.ylabel('속도 (m/s)')
-plt.grid(True)
-plt.show()
-
-# 그래프 3: 시간 vs 가속도
-plt.figure()
-plt.plot(t, acceleration)
-plt.title('시간(sec) - 가속도(m/s^2)')
-plt.xlabel('시간 (sec)')
-plt.ylabel('가속도 (m/s^2)')
-plt.grid(True)
-plt.show()
+# 파라미터 스윕 설정: 한 번에 계산할 (설정 수 × 시간 샘플 수) 상한, 그래프 하나에 그릴 최대 점 수, 결과 저장 형식
+SWEEP_CHUNK_ELEMENTS = 4_000_000
+PLOT_MAX_POINTS = 2000
+SWEEP_OUTPUT_FOLDER = 'sweep_results'
+SWEEP_SUMMARY_FILENAME = 'configs.npz'
+SWEEP_DTYPE = np.float32
+
+# 수치 적분 설정: 적응형 적분의 상대/절대 오차 허용치, 정확도 비교에 사용할 기준 해의 허용치,
+# 균일 격자 비교에서 늘려 볼 최대 스텝 수
+INTEGRATION_RTOL = 1e-6
+INTEGRATION_ATOL = 1e-9
+REFERENCE_RTOL = 1e-12
+REFERENCE_ATOL = 1e-14
+MAX_UNIFORM_STEPS = 2 ** 22
+# 질량이 처음 질량의 이 비율 이하로 줄어들면 가속도가 발산하므로 적분을 중단합니다.
+MIN_MASS_FRACTION = 0.01
+# 시간에 따라 변하는 추력 예시: (시간(초), 추력(N)) 샘플, 2차 항력 계수(N·s²/m²), 연료 소모율(kg/s)
+DEMO_THRUST_PROFILE = (np.array([0.0, 0.5, 3.0, 6.0, 8.0, 10.0]), np.array([0.0, 3.0, 3.0, 1.5, 0.0, 0.0]))
+DEMO_DRAG = 0.05
+DEMO_MASS_FLOW = 0.05
+
+def configure_font():
+    """한글 글꼴이 있으면 그래프 글꼴로 설정합니다."""
+    from matplotlib import font_manager, rc
+    if os.path.exists(font_path):
+        font_name = font_manager.FontProperties(fname=font_path).get_name()
+        rc('font', family=font_name)
+
+def time_steps(dt, t_sim):
+    """np.arange(0, t_sim + dt, dt)와 같은 시간 샘플 수를 반환합니다."""
+    return int(np.ceil((t_sim + dt) / dt))
+
+def kinematics(m, F_thr, t):
+    """질량 m, 추력 F_thr에서 시간 t의 위치, 속도, 가속도를 계산합니다. (인자는 브로드캐스트 규칙을 따름)"""
+    a = F_thr / m  # 가속도 (m/s^2)
+    position = 0.5 * a * t**2
+    velocity = a * t
+    acceleration = np.broadcast_to(a, np.broadcast(a, t).shape)
+    return position, velocity, acceleration
+
+def show_single(m=m, F_thr=F_thr, t_sim=t_sim, dt=dt):
+    """한 가지 질량/추력 설정의 시간-위치, 시간-속도, 시간-가속도 그래프를 차례로 표시합니다."""
+    import matplotlib.pyplot as plt
+    configure_font()
+    t = np.arange(0, t_sim + dt, dt)
+
+    # 위치, 속도, 가속도 계산
+    position, velocity, acceleration = kinematics(m, F_thr, t)
+
+    for values, title, ylabel in (
+        (position, '시간(sec) - 위치(m)', '위치 (m)'),
+        (velocity, '시간(sec) - 속도(m/s)', '속도 (m/s)'),
+        (acceleration, '시간(sec) - 가속도(m/s^2)', '가속도 (m/s^2)')
+    ):
+        plt.figure()
+        plt.plot(t, values)
+        plt.title(title)
+        plt.xlabel('시간 (sec)')
+        plt.ylabel(ylabel)
+        plt.grid(True)
+        plt.show()
+
+def parse_values(text):
+    """"1,2,4" 같은 목록이나 "시작:끝:개수" 형태의 등간격 범위를 float 배열로 변환합니다."""
+    if text.count(':') == 2:
+        start, stop, count = text.split(':')
+        return np.linspace(float(start), float(stop), int(count))
+    return np.array([float(value) for value in text.split(',') if value.strip()])
+
+def sweep_series_paths(output_folder, group):
+    """시간 그룹 group의 위치/속도 시계열 파일 경로를 반환합니다."""
+    return (os.path.join(output_folder, f"group_{group}_position.npy"),
+            os.path.join(output_folder, f"group_{group}_velocity.npy"))
+
+def run_sweep(masses, thrusts, dts, t_sims, output_folder=SWEEP_OUTPUT_FOLDER, store_every=1,
+              chunk_elements=SWEEP_CHUNK_ELEMENTS, save_series=True):
+    """질량 × 추력 × dt × t_sim 격자의 모든 설정을 한 번에 계산하여 output_folder에 저장합니다.
+
+    (dt, t_sim) 조합마다 한 그룹으로 묶어, 그룹 안의 모든 질량/추력 설정을
+    (설정 수, 시간) 배열 하나로 브로드캐스트 계산합니다. 시간 축은 chunk_elements를 넘지 않도록 나누어 계산하고
+    메모리 맵 파일(group_<번호>_position.npy, group_<번호>_velocity.npy)에 바로 쓰므로,
+    dt가 아주 작고 시뮬레이션 시간이 길어도 메모리 사용량이 일정합니다. store_every번째 샘플만 저장할 수 있습니다.
+    설정별 값과 최종 위치/속도는 SWEEP_SUMMARY_FILENAME에 저장하며, 처리 요약 dict를 반환합니다.
+    """
+    from numpy.lib.format import open_memmap
+    os.makedirs(output_folder, exist_ok=True)
+    start_time = time.perf_counter()
+
+    mass_grid, thrust_grid = (grid.ravel() for grid in np.meshgrid(masses, thrusts, indexing='ij'))
+    acceleration = thrust_grid / mass_grid
+    config_count = len(mass_grid)
+
+    summary = {key: [] for key in ("mass", "thrust", "dt", "t_sim", "group", "row",
+                                   "acceleration", "final_position", "final_velocity")}
+    groups = {"dt": [], "t_sim": [], "steps": [], "stored_steps": []}
+    bytes_written = 0
+    for group, (step, duration) in enumerate((step, duration) for step in dts for duration in t_sims):
+        steps = time_steps(step, duration)
+        # 저장할 샘플 번호 배열은 만들지 않고 개수만 계산합니다. (요약만 저장할 때 dt가 아주 작아도 메모리를 쓰지 않음)
+        stored_steps = -(-steps // store_every)
+        groups["dt"].append(step)
+        groups["t_sim"].append(duration)
+        groups["steps"].append(steps)
+        groups["stored_steps"].append(stored_steps)
+
+        if save_series:
+            position_path, velocity_path = sweep_series_paths(output_folder, group)
+            position_file = open_memmap(position_path, mode='w+', dtype=SWEEP_DTYPE, shape=(config_count, stored_steps))
+            velocity_file = open_memmap(velocity_path, mode='w+', dtype=SWEEP_DTYPE, shape=(config_count, stored_steps))
+            chunk = max(1, chunk_elements // config_count)
+            for offset in range(0, stored_steps, chunk):
+                t = np.arange(offset, min(offset + chunk, stored_steps)) * store_every * step
+                position, velocity, _ = kinematics(mass_grid[:, None], thrust_grid[:, None], t[None, :])
+                position_file[:, offset:offset + chunk] = position
+                velocity_file[:, offset:offset + chunk] = velocity
+            position_file.flush()
+            velocity_file.flush()
+            bytes_written += position_file.nbytes + velocity_file.nbytes
+            del position_file, velocity_file
+
+        # 최종 값은 저장 간격과 관계없이 마지막 시간 샘플에서 계산합니다.
+        final_position, final_velocity, _ = kinematics(mass_grid, thrust_grid, (steps - 1) * step)
+        for key, values in (("mass", mass_grid), ("thrust", thrust_grid), ("acceleration", acceleration),
+                            ("final_position", final_position), ("final_velocity", final_velocity)):
+            summary[key].append(values)
+        summary["dt"].append(np.full(config_count, step))
+        summary["t_sim"].append(np.full(config_count, duration))
+        summary["group"].append(np.full(config_count, group))
+        summary["row"].append(np.arange(config_count))
+
+    summary_path = os.path.join(output_folder, SWEEP_SUMMARY_FILENAME)
+    np.savez_compressed(
+        summary_path,
+        store_every=store_every,
+        **{key: np.concatenate(values) for key, values in summary.items()},
+        **{f"group_{key}": np.array(values) for key, values in groups.items()}
+    )
+    bytes_written += os.path.getsize(summary_path)
+    return {
+        "configs": config_count * len(groups["dt"]),
+        "groups": len(groups["dt"]),
+        "samples": int(sum(groups["stored_steps"]) * config_count),
+        "bytes_written": bytes_written,
+        "seconds": time.perf_counter() - start_time
+    }
+
+def as_time_function(value):
+    """상수, 시간 t의 함수, (시간 배열, 값 배열) 샘플 쌍을 시간 t의 함수로 변환합니다. (샘플 사이는 선형 보간)"""
+    if callable(value):
+        return value
+    if isinstance(value, tuple):
+        times, values = (np.asarray(array, dtype=float) for array in value)
+        return lambda t: np.interp(t, times, values)
+    return lambda t: value
+
+def motion_equation(thrust=F_thr, drag=0.0, mass_flow=0.0):
+    """상태 [위치, 속도, 질량]의 시간 미분을 계산하는 함수 f(t, y)를 만듭니다.
+
+    thrust, mass_flow는 as_time_function이 받는 형태입니다. drag는 함수 drag(t, v)이거나,
+    as_time_function이 받는 형태의 2차 항력 계수(항력 = drag(t)·v·|v|)입니다.
+    """
+    thrust_at = as_time_function(thrust)
+    mass_flow_at = as_time_function(mass_flow)
+    if callable(drag):
+        drag_at = drag
+    else:
+        drag_coefficient_at = as_time_function(drag)
+        drag_at = lambda t, v: drag_coefficient_at(t) * v * abs(v)
+
+    def rhs(t, y):
+        position, velocity, mass = y
+        force = thrust_at(t) - drag_at(t, velocity)
+        return np.array([velocity, force / mass, -mass_flow_at(t)])
+    return rhs
+
+def profile_breakpoints(t_sim, *profiles):
+    """샘플 배열로 주어진 프로필의 보간 곡선이 꺾이는 시간을 0과 t_sim 사이에서 모아 [0, ..., t_sim]으로 반환합니다."""
+    breakpoints = [0.0, t_sim]
+    for value in profiles:
+        if isinstance(value, tuple):
+            breakpoints.extend(float(point) for point in value[0] if 0.0 < point < t_sim)
+    return sorted(set(breakpoints))
+
+def simulate(thrust=F_thr, m0=m, t_sim=t_sim, drag=0.0, mass_flow=0.0, rtol=INTEGRATION_RTOL, atol=INTEGRATION_ATOL):
+    """오차 제어 적응형 스텝(Dormand-Prince RK45)으로 운동 방정식을 적분합니다.
+
+    시간에 따라 변하는 추력, 항력, 질량 변화를 다룰 수 있으며, 결과의 "solution"(t)은 스텝 사이를 보간하는
+    연속 해(dense output)로 임의의 시간에서 [위치, 속도, 질량]을 반환합니다.
+    추력, 항력 계수, 연료 소모율이 샘플 배열이면 보간 곡선이 꺾이는 샘플 시간마다 구간을 나누어 적분하므로,
+    꺾이는 점을 넘는 스텝에서 오차가 커지지 않습니다.
+    적분 중 질량이 처음 질량의 MIN_MASS_FRACTION 이하로 줄어들면 ValueError를 발생시킵니다.
+    {"solution", "t", "steps", "evaluations", "seconds"}를 반환합니다.
+    """
+    from scipy.integrate import solve_ivp, OdeSolution
+    rhs = motion_equation(thrust, drag, mass_flow)
+    breakpoints = profile_breakpoints(t_sim, thrust, drag, mass_flow)
+
+    def mass_depleted(t, y):
+        return y[2] - MIN_MASS_FRACTION * m0
+    mass_depleted.terminal = True
+
+    start = time.perf_counter()
+    y = [0.0, 0.0, m0]
+    times = [np.array([0.0])]
+    interpolants = []
+    evaluations = 0
+    for segment_start, segment_end in zip(breakpoints[:-1], breakpoints[1:]):
+        result = solve_ivp(rhs, (segment_start, segment_end), y, method='RK45', rtol=rtol, atol=atol,
+                           dense_output=True, events=mass_depleted)
+        if result.status == 1:
+            raise ValueError(f"t={result.t_events[0][0]:g}초에 질량이 모두 소모되어 더 적분할 수 없습니다.")
+        if not result.success:
+            raise RuntimeError(f"적분에 실패했습니다: {result.message}")
+        times.append(result.t[1:])
+        interpolants.extend(result.sol.interpolants)
+        evaluations += result.nfev
+        y = result.y[:, -1]
+    t = np.concatenate(times)
+    seconds = time.perf_counter() - start
+    return {
+        "solution": OdeSolution(t, interpolants),
+        "t": t,
+        "steps": len(t) - 1,
+        "evaluations": int(evaluations),
+        "seconds": seconds
+    }
+
+def integrate_uniform(thrust=F_thr, m0=m, t_sim=t_sim, drag=0.0, mass_flow=0.0, steps=1000):
+    """같은 운동 방정식을 균일한 시간 간격의 고전 RK4로 적분합니다. (적응형 적분과의 비교용)
+
+    simulate와 같은 꺾이는 점(profile_breakpoints)에서 구간을 나누고, 구간마다 길이에 비례하는 스텝 수(최소 1)로
+    균일하게 나눕니다. 꺾이는 점을 넘는 스텝이 없으므로 두 방식의 오차를 공정하게 비교할 수 있습니다.
+    (시간 배열, (실제 스텝 수 + 1, 3) 상태 배열, 걸린 시간(초))을 반환합니다.
+    """
+    rhs = motion_equation(thrust, drag, mass_flow)
+    breakpoints = profile_breakpoints(t_sim, thrust, drag, mass_flow)
+    t = np.concatenate([[0.0]] + [
+        np.linspace(segment_start, segment_end, max(1, round(steps * (segment_end - segment_start) / t_sim)) + 1)[1:]
+        for segment_start, segment_end in zip(breakpoints[:-1], breakpoints[1:])
+    ])
+    y = np.empty((len(t), 3))
+    y[0] = [0.0, 0.0, m0]
+    start = time.perf_counter()
+    for i in range(len(t) - 1):
+        h = t[i + 1] - t[i]
+        k1 = rhs(t[i], y[i])
+        k2 = rhs(t[i] + h / 2, y[i] + h / 2 * k1)
+        k3 = rhs(t[i] + h / 2, y[i] + h / 2 * k2)
+        k4 = rhs(t[i] + h, y[i] + h * k3)
+        y[i + 1] = y[i] + h / 6 * (k1 + 2 * k2 + 2 * k3 + k4)
+    return t, y, time.perf_counter() - start
+
+def validate_constant_thrust(m=m, F_thr=F_thr, t_sim=t_sim, dt=dt, rtol=INTEGRATION_RTOL, atol=INTEGRATION_ATOL):
+    """일정한 추력에서 적응형 적분 결과를 기존 해석해(kinematics)와 dt 간격의 시간 격자에서 비교합니다."""
+    result = simulate(F_thr, m, t_sim, rtol=rtol, atol=atol)
+    t = np.arange(0, t_sim + dt, dt)
+    t = t[t <= t_sim]
+    position, velocity, _ = kinematics(m, F_thr, t)
+    state = result["solution"](t)
+    return {
+        "max_position_error": float(np.max(np.abs(state[0] - position))),
+        "max_velocity_error": float(np.max(np.abs(state[1] - velocity))),
+        "adaptive_steps": result["steps"],
+        "uniform_grid_points": len(t) - 1,
+        "evaluations": result["evaluations"],
+        "seconds": result["seconds"]
+    }
+
+def compare_with_uniform_grid(thrust=DEMO_THRUST_PROFILE, m0=m, t_sim=t_sim, drag=DEMO_DRAG,
+                              mass_flow=DEMO_MASS_FLOW, rtol=INTEGRATION_RTOL, atol=INTEGRATION_ATOL):
+    """적응형 적분과 같은 정확도를 내는 데 필요한 균일 격자 RK4의 스텝 수와 시간을 비교합니다.
+
+    아주 작은 허용치로 구한 적응형 해를 기준으로 위치의 최대 오차를 재고, 균일 격자는 적응형 적분의 오차 이하가 되는
+    가장 적은 스텝 수(두 배씩 늘린 뒤 이분 탐색)를 사용합니다. 균일 격자도 simulate와 같은 꺾이는 점에서 구간을 나눕니다.
+    """
+    reference = simulate(thrust, m0, t_sim, drag, mass_flow, rtol=REFERENCE_RTOL, atol=REFERENCE_ATOL)
+    adaptive = simulate(thrust, m0, t_sim, drag, mass_flow, rtol=rtol, atol=atol)
+    check_times = np.linspace(0.0, t_sim, 1001)
+    reference_position = reference["solution"](check_times)[0]
+    adaptive_error = float(np.max(np.abs(adaptive["solution"](check_times)[0] - reference_position)))
+
+    def run_uniform(steps):
+        t, y, seconds = integrate_uniform(thrust, m0, t_sim, drag, mass_flow, steps)
+        # 균일 격자 값은 기준 해와 같은 시간에서 비교합니다.
+        return t, seconds, float(np.max(np.abs(y[:, 0] - reference["solution"](t)[0])))
+
+    # 스텝 수를 두 배씩 늘려 처음 통과하는 값을 찾고, 직전(통과하지 못한) 값과의 사이를 이분 탐색하여
+    # 적응형 적분의 오차를 만족하는 가장 적은 스텝 수를 고릅니다. (두 배 단위로 과하게 정확해지는 것 방지)
+    failed = 0
+    steps = max(1, adaptive["steps"])
+    t, seconds, uniform_error = run_uniform(steps)
+    while uniform_error > adaptive_error and steps < MAX_UNIFORM_STEPS:
+        failed, steps = steps, steps * 2
+        t, seconds, uniform_error = run_uniform(steps)
+    if uniform_error <= adaptive_error:
+        while steps - failed > 1:
+            middle = (failed + steps) // 2
+            middle_run = run_uniform(middle)
+            if middle_run[2] <= adaptive_error:
+                steps, (t, seconds, uniform_error) = middle, middle_run
+            else:
+                failed = middle
+    return {
+        "adaptive": {"steps": adaptive["steps"], "evaluations": adaptive["evaluations"],
+                     "seconds": adaptive["seconds"], "max_position_error": adaptive_error},
+        "uniform_rk4": {"steps": len(t) - 1, "evaluations": 4 * (len(t) - 1), "seconds": seconds,
+                        "max_position_error": uniform_error},
+        "step_ratio": (len(t) - 1) / max(1, adaptive["steps"])
+    }
+
+def plot_simulation(result, path, t_sim=t_sim, thrust=DEMO_THRUST_PROFILE, drag=DEMO_DRAG, mass_flow=DEMO_MASS_FLOW,
+                    points=PLOT_MAX_POINTS):
+    """적분 결과의 연속 해에서 시간-위치/속도/가속도 그래프를 그려 path에 저장합니다. (화면 없이 Agg 사용)"""
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    configure_font()
+    rhs = motion_equation(thrust, drag, mass_flow)
+    t = np.linspace(0.0, t_sim, points)
+    state = result["solution"](t)
+    acceleration = np.array([rhs(time_point, state[:, i])[1] for i, time_point in enumerate(t)])
+
+    figure, axes = plt.subplots(1, 3, figsize=(15, 4))
+    for axis, values, title, ylabel in (
+        (axes[0], state[0], '시간(sec) - 위치(m)', '위치 (m)'),
+        (axes[1], state[1], '시간(sec) - 속도(m/s)', '속도 (m/s)'),
+        (axes[2], acceleration, '시간(sec) - 가속도(m/s^2)', '가속도 (m/s^2)')
+    ):
+        axis.plot(t, values)
+        axis.plot(result["t"], np.interp(result["t"], t, values), '.', markersize=3)
+        axis.set_title(title)
+        axis.set_xlabel('시간 (sec)')
+        axis.set_ylabel(ylabel)
+        axis.grid(True)
+    figure.tight_layout()
+    figure.savefig(path)
+    plt.close(figure)
+
+def _init_plot_worker():
+    """그래프 워커 프로세스에서 화면 없이 그리는 Agg 백엔드와 글꼴을 설정합니다."""
+    import matplotlib
+    matplotlib.use('Agg')
+    configure_font()
+
+def _plot_config(job):
+    """스윕 결과의 한 설정을 위치/속도/가속도 그래프 세 개가 있는 PNG 파일로 저장합니다."""
+    import matplotlib.pyplot as plt
+    output_folder, plot_folder, index, config, store_every = job
+    mass, thrust, step, duration, group, row, acceleration = config
+    group, row = int(group), int(row)
+    position_path, velocity_path = sweep_series_paths(output_folder, group)
+    position = np.load(position_path, mmap_mode='r')[row]
+    velocity = np.load(velocity_path, mmap_mode='r')[row]
+    # 샘플이 많으면 그래프에 그릴 점만 골라 읽습니다.
+    sample_step = max(1, -(-len(position) // PLOT_MAX_POINTS))
+    position = np.asarray(position[::sample_step])
+    velocity = np.asarray(velocity[::sample_step])
+    t = np.arange(0, len(position)) * (step * store_every * sample_step)
+
+    figure, axes = plt.subplots(1, 3, figsize=(15, 4))
+    for axis, values, title, ylabel in (
+        (axes[0], position, '시간(sec) - 위치(m)', '위치 (m)'),
+        (axes[1], velocity, '시간(sec) - 속도(m/s)', '속도 (m/s)'),
+        (axes[2], np.full_like(t, acceleration), '시간(sec) - 가속도(m/s^2)', '가속도 (m/s^2)')
+    ):
+        axis.plot(t, values)
+        axis.set_title(title)
+        axis.set_xlabel('시간 (sec)')
+        axis.set_ylabel(ylabel)
+        axis.grid(True)
+    figure.suptitle(f"m={mass:g}kg, F_thr={thrust:g}N, dt={step:g}s, t_sim={duration:g}s")
+    figure.tight_layout()
+    path = os.path.join(plot_folder, f"config_{index}.png")
+    figure.savefig(path)
+    plt.close(figure)
+    return path
+
+def render_sweep_plots(output_folder=SWEEP_OUTPUT_FOLDER, processes=None, limit=None):
+    """스윕 결과의 설정별 그래프를 여러 프로세스에서 동시에 그려 output_folder/plots에 저장합니다."""
+    plot_folder = os.path.join(output_folder, 'plots')
+    os.makedirs(plot_folder, exist_ok=True)
+    with np.load(os.path.join(output_folder, SWEEP_SUMMARY_FILENAME)) as data:
+        configs = np.stack([data[key] for key in ("mass", "thrust", "dt", "t_sim", "group", "row", "acceleration")],
+                           axis=1)[:limit]
+        store_every = int(data["store_every"])
+    jobs = [(output_folder, plot_folder, index, tuple(config.tolist()), store_every)
+            for index, config in enumerate(configs)]
+    if not jobs:
+        return []
+    processes = max(1, min(processes or cpu_count(), len(jobs)))
+    context = multiprocessing.get_context('spawn')
+    with context.Pool(processes=processes, initializer=_init_plot_worker) as plot_pool:
+        return plot_pool.map(_plot_config, jobs, chunksize=max(1, len(jobs) // (processes * 4)))
+
+def main(argv=None):
+    """인자가 없으면 기본 설정의 그래프를 표시하고, --sweep이면 파라미터 스윕, --integrate이면 수치 적분을 수행합니다."""
+    parser = argparse.ArgumentParser(description="추력에 의한 등가속도 운동 시뮬레이션")
+    parser.add_argument("--sweep", action="store_true",
+                        help="질량/추력/dt/t_sim 격자의 모든 설정을 계산하여 파일로 저장합니다.")
+    parser.add_argument("--masses", type=parse_values, default=np.array([m], dtype=float),
+                        help='질량 목록 "1,2,4" 또는 범위 "시작:끝:개수" (kg)')
+    parser.add_argument("--thrusts", type=parse_values, default=np.array([F_thr], dtype=float),
+                        help='추력 목록 또는 범위 (N)')
+    parser.add_argument("--dts", type=parse_values, default=np.array([dt]),
+                        help='시간 간격 목록 또는 범위 (초)')
+    parser.add_argument("--t-sims", type=parse_values, default=np.array([t_sim], dtype=float),
+                        help='시뮬레이션 시간 목록 또는 범위 (초)')
+    parser.add_argument("--output", default=SWEEP_OUTPUT_FOLDER,
+                        help="결과를 저장할 폴더")
+    parser.add_argument("--store-every", type=int, default=1,
+                        help="시계열을 이 간격의 샘플마다 저장합니다.")
+    parser.add_argument("--summary-only", action="store_true",
+                        help="시계열 없이 설정별 최종 값만 저장합니다. (그래프도 그리지 않음)")
+    parser.add_argument("--plots", type=int, default=None, metavar="N",
+                        help="처음 N개 설정의 그래프를 그립니다. (기본값: 모든 설정, 0이면 그리지 않음)")
+    parser.add_argument("--processes", type=int, default=None,
+                        help="그래프를 그릴 프로세스 수 (기본값: CPU 코어 수)")
+    parser.add_argument("--integrate", action="store_true",
+                        help="시간에 따라 변하는 추력/항력/질량 변화를 적응형 스텝으로 적분하고 균일 격자와 비교합니다.")
+    parser.add_argument("--thrust-csv", metavar="PATH",
+                        help="추력 샘플 CSV (한 줄에 \"시간,추력\") (기본값: 예시 추력 곡선)")
+    parser.add_argument("--drag", type=float, default=DEMO_DRAG,
+                        help=f"2차 항력 계수 (기본값: {DEMO_DRAG:g})")
+    parser.add_argument("--mass-flow", type=float, default=DEMO_MASS_FLOW,
+                        help=f"연료 소모율 kg/s (기본값: {DEMO_MASS_FLOW:g})")
+    parser.add_argument("--rtol", type=float, default=INTEGRATION_RTOL,
+                        help=f"적응형 적분의 상대 오차 허용치 (기본값: {INTEGRATION_RTOL:g})")
+    parser.add_argument("--atol", type=float, default=INTEGRATION_ATOL,
+                        help=f"적응형 적분의 절대 오차 허용치 (기본값: {INTEGRATION_ATOL:g})")
+    parser.add_argument("--plot", metavar="PATH",
+                        help="적분 결과 그래프를 PNG 파일로 저장합니다.")
+    args = parser.parse_args(argv)
+
+    if args.integrate:
+        thrust = DEMO_THRUST_PROFILE
+        if args.thrust_csv:
+            samples = np.loadtxt(args.thrust_csv, delimiter=',', ndmin=2)
+            thrust = (samples[:, 0], samples[:, 1])
+        duration = float(args.t_sims[-1])
+        if args.mass_flow * duration >= (1 - MIN_MASS_FRACTION) * m:
+            parser.error(f"--mass-flow {args.mass_flow:g}로는 {duration:g}초 전에 질량 {m}kg이 모두 소모됩니다.")
+        report = {
+            "validation": validate_constant_thrust(rtol=args.rtol, atol=args.atol),
+            "comparison": compare_with_uniform_grid(thrust, m, duration, args.drag, args.mass_flow,
+                                                    rtol=args.rtol, atol=args.atol)
+        }
+        if args.plot:
+            result = simulate(thrust, m, duration, args.drag, args.mass_flow, rtol=args.rtol, atol=args.atol)
+            plot_simulation(result, args.plot, duration, thrust, args.drag, args.mass_flow)
+        print(json.dumps(report, ensure_ascii=False, indent=4))
+        return
+
+    if not args.sweep:
+        show_single()
+        return
+
+    if args.store_every < 1:
+        parser.error("--store-every는 1 이상이어야 합니다.")
+    result = run_sweep(args.masses, args.thrusts, args.dts, args.t_sims, args.output,
+                       store_every=args.store_every, save_series=not args.summary_only)
+    if not args.summary_only and args.plots != 0:
+        start = time.perf_counter()
+        result["plots"] = len(render_sweep_plots(args.output, args.processes, args.plots))
+        result["plot_seconds"] = time.perf_counter() - start
+    print(json.dumps(result, ensure_ascii=False, indent=4))
+
+if __name__ == "__main__":
+    main(sys.argv[1:])